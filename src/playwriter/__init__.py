@@ -0,0 +1,7 @@
+"""playwriter: a storyteller of last resort.
+
+Agent federation, multiple world representation threads, stochastic
+events and state management. The writer writes the writer.
+"""
+
+__version__ = "0.1.0"
@@ -0,0 +1,354 @@
+"""Macro-scale narrative state: worlds, acts, scenes, beats.
+
+A ``NarrativeWorld`` is the full mutable state of one running play — the
+TCCN seed, the generated characters, the thread states, and the act/scene/
+beat tree the engine grows as the story advances.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+import numpy as np
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
+
+from ..models import TCCN, Character, Trope
+from ..services.dice import DiceRoll
+
+_OUTCOME_INDEX = {
+    "catastrophic_failure": 0,
+    "failure": 1,
+    "mixed": 2,
+    "success": 3,
+    "critical_success": 4,
+}
+
+
+class ThreadState(BaseModel):
+    """Current status of one narrative thread."""
+
+    thread_name: str
+    status: str = "active"
+    detail: str = ""
+
+
+class ActPlan(BaseModel):
+    """The planner's intent for an act before its scenes exist."""
+
+    summary: str = ""
+    thread_goals: Dict[str, str] = Field(default_factory=dict)
+    expected_scenes: int = 3
+
+
+class WorldEvent(BaseModel):
+    """A stochastic world-scale event injected between scenes."""
+
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
+    description: str
+    scope: str = "local"
+    trope_name: str = ""
+
+
+class TeleologyShift(BaseModel):
+    """A recorded drift of the story's destination after an act."""
+
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
+    before: str = ""
+    after: str = ""
+    rationale: str = ""
+
+
+class Beat(BaseModel):
+    """One resolved action inside a scene."""
+
+    id: str
+    actor: str
+    action: str
+    actual_outcome: str = ""
+    prose: str = ""
+    dice_roll: Optional[DiceRoll] = None
+
+
+class EngineScene(BaseModel):
+    """A scene as the engine runs it: cast, planned beats, resolved beats."""
+
+    id: str
+    number: int
+    setting: str = ""
+    place: str = ""
+    actors: List[str] = Field(default_factory=list)
+    status: str = "pending"
+    planned_actions: List[str] = Field(default_factory=list)
+    beats: List[Beat] = Field(default_factory=list)
+    full_prose: str = ""
+
+    # Rendered text of the tropes drawn for this scene, pinned at
+    # composition so retries and downstream prompts stay byte-stable.
+    _trope_text: str = PrivateAttr(default="")
+
+    # Rolling tail of the last three resolved beats, maintained as beats
+    # are recorded so beat prompts don't re-slice and re-format the
+    # beats list every call as scenes grow.
+    _recent_events: Deque[str] = PrivateAttr(
+        default_factory=lambda: deque(maxlen=3)
+    )
+
+    @property
+    def trope_text(self) -> str:
+        return self._trope_text
+
+    def pin_trope_text(self, text: str) -> None:
+        self._trope_text = text
+
+    # Rendered dossiers of this scene's cast, staged once per scene for
+    # beat prompts. The pipeline fills it lazily and drops an entry when
+    # a delta mutates that actor.
+    _actor_profile_cache: Dict[str, str] = PrivateAttr(default_factory=dict)
+
+    # Monotonic counter behind next_beat_id.
+    _beat_id_counter: int = PrivateAttr(default=0)
+
+    @property
+    def actor_profile_cache(self) -> Dict[str, str]:
+        return self._actor_profile_cache
+
+    @property
+    def recent_events_text(self) -> str:
+        if not self._recent_events and self.beats:
+            # Scenes rebuilt from serialized state arrive with a cold tail.
+            for beat in self.beats[-3:]:
+                self._recent_events.append(f"- {beat.actor}: {beat.actual_outcome}")
+        return "\n".join(self._recent_events)
+
+    def next_beat_id(self) -> str:
+        """Deterministic beat id: scene-id prefix plus a local counter.
+
+        Cheaper than uuid4 (no entropy syscall and hex formatting per
+        beat) and stable across replays of the same scene, which keeps
+        response-cache keys reproducible.
+        """
+        if self._beat_id_counter == 0 and self.beats:
+            # Scenes rebuilt from serialized state resume past their
+            # recorded beats instead of reissuing their ids.
+            self._beat_id_counter = len(self.beats)
+        self._beat_id_counter += 1
+        return f"{self.id[:6]}{self._beat_id_counter:06x}"
+
+    def note_beat(self, beat: Beat) -> None:
+        """Fold a just-recorded beat into the rolling tail."""
+        if not self._recent_events and len(self.beats) > 1:
+            for prior in self.beats[-3:-1]:
+                self._recent_events.append(f"- {prior.actor}: {prior.actual_outcome}")
+        self._recent_events.append(f"- {beat.actor}: {beat.actual_outcome}")
+
+
+class Act(BaseModel):
+    """An act: its plan, its scenes, and what the world did around them."""
+
+    id: str
+    number: int
+    status: str = "planning"
+    plan: Optional[ActPlan] = None
+    scenes: List[EngineScene] = Field(default_factory=list)
+    world_events: List[WorldEvent] = Field(default_factory=list)
+    teleology_shift: Optional[TeleologyShift] = None
+
+    # Rendered text of the tropes drawn for this act; see EngineScene.
+    _trope_text: str = PrivateAttr(default="")
+
+    # Pipeline look-ahead: a running compose-and-plan task for this act's
+    # next scene, handed off between consecutive advance() calls.
+    _next_scene_future: Optional[asyncio.Task] = PrivateAttr(default=None)
+
+    @property
+    def trope_text(self) -> str:
+        return self._trope_text
+
+    def pin_trope_text(self, text: str) -> None:
+        self._trope_text = text
+
+    @property
+    def next_scene_future(self) -> Optional[asyncio.Task]:
+        return self._next_scene_future
+
+    def set_next_scene_future(self, task: Optional[asyncio.Task]) -> None:
+        self._next_scene_future = task
+
+
+class BeatColumns:
+    """Structure-of-arrays mirror of every resolved beat in a world.
+
+    Analytics passes ("critical successes per actor", "modifier totals")
+    only touch one or two Beat fields each; walking the act/scene/beat tree
+    pays a Python attribute fetch per touch. This column store is appended
+    to whenever a beat is recorded, so aggregate queries run as vectorized
+    NumPy ops over contiguous arrays instead of object traversals.
+    """
+
+    __slots__ = ("raw_roll", "final_value", "outcome_idx", "actor", "scene_id", "_size")
+
+    def __init__(self, capacity: int = 256) -> None:
+        self.raw_roll = np.zeros(capacity, dtype=np.int16)
+        self.final_value = np.zeros(capacity, dtype=np.int16)
+        self.outcome_idx = np.zeros(capacity, dtype=np.int8)
+        self.actor = np.empty(capacity, dtype=object)
+        self.scene_id = np.empty(capacity, dtype=object)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, beat: Beat, scene_id: str) -> None:
+        """Record one resolved beat; beats without a roll are skipped."""
+        roll = beat.dice_roll
+        if roll is None:
+            return
+        if self._size == len(self.raw_roll):
+            self._grow()
+        i = self._size
+        self.raw_roll[i] = roll.raw_roll
+        self.final_value[i] = roll.final_value
+        self.outcome_idx[i] = _OUTCOME_INDEX[roll.outcome.value]
+        self.actor[i] = beat.actor
+        self.scene_id[i] = scene_id
+        self._size = i + 1
+
+    def _grow(self) -> None:
+        new_cap = len(self.raw_roll) * 2
+        self.raw_roll = np.resize(self.raw_roll, new_cap)
+        self.final_value = np.resize(self.final_value, new_cap)
+        self.outcome_idx = np.resize(self.outcome_idx, new_cap)
+        self.actor = np.resize(self.actor, new_cap)
+        self.scene_id = np.resize(self.scene_id, new_cap)
+
+    def view(self) -> dict[str, np.ndarray]:
+        """Return trimmed read-only views of the live columns."""
+        n = self._size
+        return {
+            "raw_roll": self.raw_roll[:n],
+            "final_value": self.final_value[:n],
+            "outcome_idx": self.outcome_idx[:n],
+            "actor": self.actor[:n],
+            "scene_id": self.scene_id[:n],
+        }
+
+
+class NarrativeWorld(BaseModel):
+    """The complete mutable state of one running play."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    id: str
+    tccn: TCCN
+    characters: Dict[str, Character] = Field(default_factory=dict)
+    thread_states: List[ThreadState] = Field(default_factory=list)
+    acts: List[Act] = Field(default_factory=list)
+    global_trope_pool: List[Trope] = Field(default_factory=list)
+    # Prose is kept as a list of chunks: writers append, readers join.
+    # Growing one str with += is O(N^2) in total prose length and doubles
+    # peak memory during every concat; megabytes of play accumulate here.
+    accumulated_prose_chunks: List[str] = Field(default_factory=list)
+
+    _beat_columns: BeatColumns = PrivateAttr(default_factory=BeatColumns)
+    # Scene lookup by id. The acts list stays the source of truth; this
+    # index exists because every beat resolution and post-scene update
+    # would otherwise walk acts x scenes to find its scene.
+    _scene_index: Dict[str, EngineScene] = PrivateAttr(default_factory=dict)
+    # Pointer to the scene currently being played, set by the session
+    # driver when play actually reaches a scene (not at composition:
+    # prefetch composes scenes ahead of play) and cleared on completion,
+    # so "where is the play now" never needs a scan.
+    _current_scene: Optional[EngineScene] = PrivateAttr(default=None)
+    # Mutation counters for the three prompt-text views the engine renders
+    # from this world (thread states, characters, accumulated events).
+    # Renderers key their memoization on these, so a view is rebuilt only
+    # after the state behind it actually changed.
+    _rev_threads: int = PrivateAttr(default=0)
+    _rev_chars: int = PrivateAttr(default=0)
+    _rev_events: int = PrivateAttr(default=0)
+
+    @property
+    def threads_rev(self) -> int:
+        return self._rev_threads
+
+    @property
+    def chars_rev(self) -> int:
+        return self._rev_chars
+
+    @property
+    def events_rev(self) -> int:
+        return self._rev_events
+
+    def bump_threads_rev(self) -> None:
+        self._rev_threads += 1
+
+    def bump_chars_rev(self) -> None:
+        self._rev_chars += 1
+
+    def bump_events_rev(self) -> None:
+        self._rev_events += 1
+
+    # (chunk count, joined text) of the last accumulated_prose read;
+    # repeated exports between appends reuse the same join.
+    _prose_cache: Optional[tuple] = PrivateAttr(default=None)
+
+    @property
+    def accumulated_prose(self) -> str:
+        """The full prose so far, joined on demand and memoized."""
+        n = len(self.accumulated_prose_chunks)
+        if self._prose_cache is None or self._prose_cache[0] != n:
+            self._prose_cache = (n, "".join(self.accumulated_prose_chunks))
+        return self._prose_cache[1]
+
+    def append_prose(self, chunk: str) -> None:
+        self.accumulated_prose_chunks.append(chunk)
+
+    @property
+    def beat_columns(self) -> BeatColumns:
+        return self._beat_columns
+
+    @property
+    def current_act(self) -> Optional[Act]:
+        """The act in progress — always the last planned one."""
+        return self.acts[-1] if self.acts else None
+
+    @property
+    def current_scene(self) -> Optional[EngineScene]:
+        """The running scene, or None between scenes."""
+        return self._current_scene
+
+    def index_scene(self, scene: EngineScene) -> None:
+        """Register a newly composed scene for O(1) lookup."""
+        self._scene_index[scene.id] = scene
+
+    def scene_started(self, scene: EngineScene) -> None:
+        """Point the world at the scene play has just reached."""
+        self._current_scene = scene
+
+    def scene_completed(self, scene: EngineScene) -> None:
+        """Drop the current-scene pointer when that scene closes."""
+        if self._current_scene is scene:
+            self._current_scene = None
+
+    def find_scene(self, scene_id: str) -> Optional[EngineScene]:
+        """Look a scene up by id; falls back to (and repairs from) the tree."""
+        scene = self._scene_index.get(scene_id)
+        if scene is not None:
+            return scene
+        # Worlds rebuilt from serialized state arrive with a cold index.
+        for act in self.acts:
+            for candidate in act.scenes:
+                self._scene_index.setdefault(candidate.id, candidate)
+        return self._scene_index.get(scene_id)
+
+    def record_beat(self, beat: Beat, scene: EngineScene) -> None:
+        """Append a resolved beat to a scene and to the analytics columns."""
+        scene.beats.append(beat)
+        scene.note_beat(beat)
+        self._beat_columns.append(beat, scene.id)
+        # Beats feed the accumulated-events view.
+        self._rev_events += 1
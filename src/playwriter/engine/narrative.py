@@ -0,0 +1,741 @@
+"""The narrative engine: grows a world act by act, scene by scene.
+
+``NarrativeEngine`` owns the macro loop of a play. It initializes a
+``NarrativeWorld`` from a TCCN seed, plans acts, composes scenes, injects
+world events, audits teleology drift, and keeps thread states and
+character dossiers current as scenes complete. The micro loop — resolving
+individual beats — lives in the pipeline service.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+import secrets
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import orjson
+
+from ..llm import LLMProvider
+from ..models import TCCN, Character
+from ..output_parser import OutputParser
+from ..prompts import PromptLoader
+from ..services.character import CharacterService
+from ..services.trope import TropeService
+from .models import (
+    Act,
+    ActPlan,
+    EngineScene,
+    NarrativeWorld,
+    TeleologyShift,
+    ThreadState,
+    WorldEvent,
+)
+
+
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _json_loads(s: str | bytes) -> object:
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError, so existing
+    # except clauses keep working.
+    return orjson.loads(s)
+
+
+def _json_dumps(obj: object) -> str:
+    return orjson.dumps(obj).decode()
+
+
+def _json_dumps_pretty(obj: object) -> str:
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+
+# Compiled at import: re's internal pattern cache is small and shared
+# process-wide, and this runs for every engine LLM response.
+_FENCE_RE = re.compile(r"```(?:json)?\s*\n?(.*?)```", re.DOTALL)
+
+_VALID_THREAD_STATUSES = frozenset(
+    {"active", "advancing", "stalled", "resolved", "spawned"}
+)
+
+
+@dataclass(slots=True)
+class PromptContext:
+    """One tick's snapshot of the rendered world views.
+
+    Methods that accept it reuse the exact strings instead of re-reading
+    the memoized views, which both skips the lookups and guarantees the
+    prompts of a tick agree byte-for-byte even if state mutates midway.
+    """
+
+    thread_text: str
+    chars_text: str
+    events_text: str
+
+
+def _safe_json_loads(text: str) -> object:
+    """Parse JSON out of an LLM response, tolerating fences and prose.
+
+    Providers in JSON mode return clean JSON almost every time, so the
+    direct parse runs first and the fence/scan machinery only prices in
+    on actual dirty output.
+    """
+    try:
+        return _json_loads(text.strip())
+    except json.JSONDecodeError:
+        return _safe_json_loads_fallback(text)
+
+
+def _safe_json_loads_fallback(text: str) -> object:
+    """Salvage JSON from fenced or prose-wrapped output.
+
+    After fence stripping, candidate start positions are fed to the C
+    ``raw_decode`` scanner, which stops at the first complete value and —
+    unlike the depth-counting loop it replaced — understands string
+    quoting, so a brace inside a string literal can't derail it.
+    """
+    match = _FENCE_RE.search(text)
+    if match:
+        text = match.group(1)
+    stripped = text.strip()
+    for i, ch in enumerate(stripped):
+        if ch in "{[":
+            try:
+                value, _ = _JSON_DECODER.raw_decode(stripped, i)
+            except json.JSONDecodeError:
+                continue
+            return value
+    return _json_loads(stripped)
+
+
+class _CharIndex:
+    """Pre-computed character views for one world at one chars rev.
+
+    Collects the small per-call reads scattered across the engine — the
+    name tuple, the first-three suggestion string, and every rendered
+    dossier — into one structure rebuilt only when the cast changes.
+    """
+
+    __slots__ = ("rev", "names", "first3", "prompt_text_by_name")
+
+    def __init__(self, world: NarrativeWorld) -> None:
+        self.rev = world.chars_rev
+        self.names = tuple(world.characters)
+        self.first3 = ", ".join(self.names[:3])
+        self.prompt_text_by_name = {
+            name: char.to_prompt_text() for name, char in world.characters.items()
+        }
+
+
+class NarrativeEngine:
+    """Runs the macro narrative loop over one or more worlds."""
+
+    def __init__(
+        self,
+        strong_llm: LLMProvider,
+        fast_llm: LLMProvider | None = None,
+        characters: CharacterService | None = None,
+        tropes: TropeService | None = None,
+        prompts: PromptLoader | None = None,
+        on_progress: Callable[[str, str], None] | None = None,
+        gen_concurrency: int = 5,
+    ) -> None:
+        self._strong = strong_llm
+        self._fast = fast_llm or strong_llm
+        self._characters = characters or CharacterService(strong_llm)
+        self._tropes = tropes or TropeService()
+        self._prompts = prompts or PromptLoader(
+            constants={
+                "format_instructions_character": OutputParser.format_instructions(Character)
+            }
+        )
+        self._on_progress = on_progress
+        # Bound concurrent generation calls so a large cast does not blow
+        # through provider rate limits.
+        self._gen_sem = asyncio.Semaphore(gen_concurrency)
+        # Bound for the per-character fallback updates after a scene.
+        self._char_update_sem = asyncio.Semaphore(4)
+        self._worlds: Dict[str, NarrativeWorld] = {}
+        # Memoized prompt-text views per world, keyed kind -> (rev, text).
+        # The three views are rebuilt only when the matching rev counter on
+        # the world has moved, and staying byte-identical between mutations
+        # also keeps prompt prefixes stable for provider-side caching.
+        self._text_cache: Dict[str, Dict[str, tuple]] = {}
+        # Per-world character index, rebuilt lazily when chars_rev moves.
+        self._char_index: Dict[str, _CharIndex] = {}
+
+    def _progress(self, event: str, detail: str = "") -> None:
+        if self._on_progress is not None:
+            self._on_progress(event, detail)
+
+    # ------------------------------------------------------------------
+    # World lifecycle
+    # ------------------------------------------------------------------
+
+    async def initialize_world(self, tccn: TCCN) -> NarrativeWorld:
+        """Generate the cast and open a new world for ``tccn``.
+
+        Character generation and refinement are independent per character,
+        so the whole cast is launched concurrently: 2N serial round-trips
+        become two round-trips of latency, bounded by the semaphore.
+        """
+        chars_to_gen = tccn.characters
+        total = len(chars_to_gen)
+
+        async def _gen_and_refine(cs, i: int) -> Character:
+            async with self._gen_sem:
+                char = await self._characters.generate(tccn, cs)
+            self._progress("character_generated", f"({i + 1}/{total}) {char.name}")
+            async with self._gen_sem:
+                char = await self._characters.refine(tccn, char)
+            voice_snip = (
+                (char.voice_style[:120] + "...") if char.voice_style else "(no voice style)"
+            )
+            self._progress(
+                "character_refined", f"({i + 1}/{total}) {char.name} — {voice_snip}"
+            )
+            return char
+
+        results = await asyncio.gather(
+            *(_gen_and_refine(cs, i) for i, cs in enumerate(chars_to_gen))
+        )
+        characters = {char.name: char for char in results}
+
+        world = NarrativeWorld(
+            id=secrets.token_hex(6),
+            tccn=tccn,
+            characters=characters,
+            thread_states=[
+                ThreadState(thread_name=t.name) for t in tccn.narrative_threads
+            ],
+            global_trope_pool=self._tropes.sample_random(n=12).tropes,
+        )
+        self._worlds[world.id] = world
+        self._progress("world_initialized", world.id)
+        return world
+
+    def get_world(self, world_id: str) -> NarrativeWorld:
+        world = self._worlds.get(world_id)
+        if world is None:
+            raise ValueError(f"Unknown world: {world_id}")
+        return world
+
+    # ------------------------------------------------------------------
+    # Acts and scenes
+    # ------------------------------------------------------------------
+
+    async def plan_act(self, world_id: str) -> Act:
+        """Plan the next act from the current thread and world state."""
+        world = self.get_world(world_id)
+        act_number = len(world.acts) + 1
+        ctx = self._prompt_context(world)
+        user_prompt = self._prompts.render(
+            "engine",
+            "ACT_PLANNER",
+            act_number=act_number,
+            thread_states=ctx.thread_text,
+            accumulated_events=ctx.events_text,
+        )
+        raw = await self._strong.complete(
+            system_prompt="You are a master dramaturg planning the arc of a play.",
+            user_prompt=user_prompt,
+            json_mode=True,
+            max_tokens=1536,
+            cacheable_prefix=self._world_prefix(world),
+        )
+        data = _safe_json_loads(raw)
+        plan = ActPlan(
+            summary=str(data.get("summary", "")),
+            thread_goals=dict(data.get("thread_goals", {})),
+            expected_scenes=int(data.get("expected_scenes", 3)),
+        )
+        act = Act(id=secrets.token_hex(6), number=act_number, status="running", plan=plan)
+        # Draw this act's tropes once: world-event prompts within the act
+        # reuse the same rendered text, staying byte-stable across retries.
+        act.pin_trope_text(self._tropes.sample_random(n=2).to_prompt_text())
+        world.acts.append(act)
+        self._progress("act_planned", f"Act {act_number}: {plan.summary[:80]}")
+        return act
+
+    async def compose_next_scene(self, world_id: str) -> EngineScene:
+        """Compose the next scene of the current act."""
+        world = self.get_world(world_id)
+        act = self._current_act(world)
+        scene_number = len(act.scenes) + 1
+        trope_text = self._tropes.sample_random(n=3).to_prompt_text()
+        user_prompt = self._prompts.render(
+            "engine",
+            "ENGINE_SCENE_COMPOSER",
+            scene_number=scene_number,
+            act_plan=_json_dumps(act.plan.thread_goals) if act.plan else "{}",
+            thread_states=self._thread_states_text(world),
+            trope_text=trope_text,
+            suggested_actors=self._char_idx(world).first3,
+        )
+        raw = await self._strong.complete(
+            system_prompt="You are a master playwright composing the next scene.",
+            user_prompt=user_prompt,
+            json_mode=True,
+            max_tokens=1536,
+            cacheable_prefix=self._world_prefix(world),
+        )
+        data = _safe_json_loads(raw)
+        scene = EngineScene(
+            id=secrets.token_hex(6),
+            number=scene_number,
+            setting=str(data.get("setting", "")),
+            place=str(data.get("place", "")),
+            actors=[str(a) for a in data.get("actors", [])],
+            status="running",
+            planned_actions=[str(a) for a in data.get("planned_actions", [])],
+        )
+        scene.pin_trope_text(trope_text)
+        act.scenes.append(scene)
+        world.index_scene(scene)
+        self._progress("scene_composed", f"Scene {scene_number}: {scene.setting[:80]}")
+        return scene
+
+    def complete_scene(self, world_id: str, scene_id: str, prose: str) -> EngineScene:
+        """Mark a scene complete and fold its prose into the world record."""
+        world = self.get_world(world_id)
+        scene = self._find_scene(world, scene_id)
+        if scene is None:
+            raise ValueError(f"Unknown scene: {scene_id}")
+        scene.full_prose = prose
+        scene.status = "complete"
+        world.scene_completed(scene)
+        # Header and prose land as separate chunks: the scene-length prose
+        # string is referenced, not copied into a combined f-string.
+        world.append_prose(f"\n\n--- Scene {scene.number} ---\n\n")
+        world.append_prose(prose)
+        return scene
+
+    async def complete_act(self, world_id: str) -> Act:
+        """Close the current act: world events, teleology audit, context.
+
+        Event generation and the teleology audit both build their prompts
+        from the state as it stands at entry and write to disjoint fields
+        (act.world_events vs act.teleology_shift / tccn.teleology), so
+        they run concurrently. The context rewrite runs after, because it
+        must see the new events.
+        """
+        world = self.get_world(world_id)
+        act = self._current_act(world)
+        ctx = self._prompt_context(world)
+        await asyncio.gather(
+            self.generate_world_events(world_id),
+            self.evaluate_teleology_shift(world_id, ctx=ctx),
+        )
+        # Deliberately not the entry snapshot: the rewrite must see the
+        # events generated above.
+        await self.update_context(world_id)
+        act.status = "complete"
+        self._progress("act_completed", f"Act {act.number}")
+        return act
+
+    # ------------------------------------------------------------------
+    # World evolution
+    # ------------------------------------------------------------------
+
+    async def generate_world_events(
+        self, world_id: str, n_events: int = 2, reroll_tropes: bool = False
+    ) -> List[WorldEvent]:
+        """Inject world-scale events seeded by recent beats and tropes.
+
+        Tropes are pinned per act at plan time; ``reroll_tropes`` draws a
+        fresh sample for callers who want variation at the cost of a
+        changed prompt.
+        """
+        world = self.get_world(world_id)
+        act = self._current_act(world)
+        if reroll_tropes or not act.trope_text:
+            act.pin_trope_text(self._tropes.sample_random(n=2).to_prompt_text())
+        # Only the tail 20 beats reach the prompt; the bounded deque keeps
+        # exactly those instead of growing a list the act's full length
+        # and slicing a copy off its end.
+        beat_summaries: deque[str] = deque(maxlen=20)
+        for scene in act.scenes:
+            beat_summaries.extend(
+                f"- {beat.actor}: {beat.actual_outcome}" for beat in scene.beats
+            )
+        user_prompt = self._prompts.render(
+            "engine",
+            "WORLD_EVENT_GENERATOR",
+            beat_summaries="\n".join(beat_summaries) or "(no beats yet)",
+            trope_text=act.trope_text,
+            n_events=str(n_events),
+        )
+        # Consume the response as a stream and lift event objects out of
+        # the growing buffer as each one completes, so model construction
+        # overlaps the provider's decode instead of waiting for the final
+        # token. Providers without real streaming yield one full chunk and
+        # degrade to the old parse-at-end behavior.
+        events: List[WorldEvent] = []
+        buffer = ""
+        scan = -1  # position past the last consumed array item; -1 = array not found yet
+        stream = self._strong.stream(
+            system_prompt="You move the world around the protagonists.",
+            user_prompt=user_prompt,
+            json_mode=True,
+            max_tokens=1024,
+            cacheable_prefix=self._world_prefix(world),
+        )
+        async for chunk in stream:
+            buffer += chunk
+            if scan < 0:
+                key = buffer.find('"events"')
+                bracket = buffer.find("[", key) if key != -1 else -1
+                if bracket == -1:
+                    continue
+                scan = bracket + 1
+            while True:
+                start = buffer.find("{", scan)
+                if start == -1:
+                    break
+                try:
+                    item, end = _JSON_DECODER.raw_decode(buffer, start)
+                except json.JSONDecodeError:
+                    break  # item still incomplete; wait for more tokens
+                scan = end
+                if isinstance(item, dict):
+                    events.append(
+                        WorldEvent(
+                            description=str(item.get("description", "")),
+                            scope=str(item.get("scope", "local")),
+                            trope_name=str(item.get("trope_name", "")),
+                        )
+                    )
+        if scan < 0 and buffer:
+            # No recognizable array in the stream; salvage from full text.
+            data = _safe_json_loads(buffer)
+            items = data.get("events", []) if isinstance(data, dict) else data
+            events = [
+                WorldEvent(
+                    description=str(item.get("description", "")),
+                    scope=str(item.get("scope", "local")),
+                    trope_name=str(item.get("trope_name", "")),
+                )
+                for item in items
+                if isinstance(item, dict)
+            ]
+        act.world_events.extend(events)
+        world.bump_events_rev()
+        self._progress("world_events", f"{len(events)} events")
+        return events
+
+    async def evaluate_teleology_shift(
+        self, world_id: str, ctx: PromptContext | None = None
+    ) -> Optional[TeleologyShift]:
+        """Audit whether recent events have bent the story's destination."""
+        world = self.get_world(world_id)
+        act = self._current_act(world)
+        if ctx is None:
+            ctx = self._prompt_context(world)
+        user_prompt = self._prompts.render(
+            "engine",
+            "TELEOLOGY_SHIFT_EVALUATOR",
+            teleology=world.tccn.teleology,
+            thread_states=ctx.thread_text,
+            accumulated_events=ctx.events_text,
+        )
+        raw = await self._strong.complete(
+            system_prompt="You audit narrative teleology with restraint.",
+            user_prompt=user_prompt,
+            json_mode=True,
+            max_tokens=768,
+            cacheable_prefix=self._world_prefix(world),
+        )
+        data = _safe_json_loads(raw)
+        if not data.get("shift"):
+            return None
+        shift = TeleologyShift(
+            before=world.tccn.teleology,
+            after=str(data.get("after", "")),
+            rationale=str(data.get("rationale", "")),
+        )
+        act.teleology_shift = shift
+        world.tccn.teleology = shift.after
+        self._progress("teleology_shift", shift.rationale[:80])
+        return shift
+
+    async def update_context(self, world_id: str) -> str:
+        """Rewrite the TCCN context to reflect the world as it now stands."""
+        world = self.get_world(world_id)
+        user_prompt = self._prompts.render(
+            "engine",
+            "CONTEXT_UPDATER",
+            context=world.tccn.context,
+            accumulated_events=self._accumulated_events_text(world),
+        )
+        raw = await self._strong.complete(
+            system_prompt="You maintain a living world-context document.",
+            user_prompt=user_prompt,
+            max_tokens=1536,
+        )
+        world.tccn.context = raw.strip()
+        return world.tccn.context
+
+    async def advance_thread_states(
+        self, world_id: str, scene_id: str
+    ) -> List[ThreadState]:
+        """Re-evaluate every thread after a scene completes."""
+        world = self.get_world(world_id)
+        scene = self._find_scene(world, scene_id)
+        if scene is None:
+            raise ValueError(f"Unknown scene: {scene_id}")
+        beat_summaries: List[str] = []
+        for beat in scene.beats:
+            beat_summaries.append(f"- {beat.actor}: {beat.actual_outcome}")
+        user_prompt = self._prompts.render(
+            "engine",
+            "THREAD_STATE_ADVANCER",
+            thread_states=self._thread_states_text(world),
+            beat_summaries="\n".join(beat_summaries) or "(no beats)",
+        )
+        raw = await self._fast.complete(
+            system_prompt="You track narrative threads precisely.",
+            user_prompt=user_prompt,
+            json_mode=True,
+            max_tokens=1024,
+        )
+        data = _safe_json_loads(raw)
+        new_states: List[ThreadState] = []
+        resolved_count = 0
+        for item in data.get("threads", []):
+            status = str(item.get("status", "active"))
+            if status not in _VALID_THREAD_STATUSES:
+                status = "active"
+            elif status == "resolved":
+                resolved_count += 1
+            new_states.append(
+                ThreadState(
+                    thread_name=str(item.get("thread_name", "")),
+                    status=status,
+                    detail=str(item.get("detail", "")),
+                )
+            )
+        if new_states:
+            world.thread_states = new_states
+            world.bump_threads_rev()
+        self._progress(
+            "threads_advanced", f"{len(new_states)} threads, {resolved_count} resolved"
+        )
+        return world.thread_states
+
+    async def update_characters_after_scene(
+        self,
+        world_id: str,
+        scene_id: str,
+        deltas_by_char: Dict[str, List[dict]],
+    ) -> Dict[str, Character]:
+        """Fold a scene's state deltas back into each character dossier.
+
+        All characters ride in one batched prompt: the shared world prefix
+        is paid once instead of M times and M round-trips collapse into
+        one. The per-character path survives as a fallback for when the
+        batch response fails to parse.
+        """
+        world = self.get_world(world_id)
+        scene = self._find_scene(world, scene_id)
+        if scene is None:
+            raise ValueError(f"Unknown scene: {scene_id}")
+        beat_summaries = "\n".join(
+            f"- {beat.actor}: {beat.actual_outcome}" for beat in scene.beats
+        )
+        items = [
+            (char_name, world.characters[char_name], deltas)
+            for char_name, deltas in deltas_by_char.items()
+            if char_name in world.characters
+        ]
+        if not items:
+            return {}
+
+        updated = await self._update_characters_batched(world, items, beat_summaries)
+        if updated is None:
+            # Batch parse failed; fall back to one call per character,
+            # fanned out concurrently — each writes a distinct key, so the
+            # only coordination needed is the semaphore inside the helper.
+            results = await asyncio.gather(
+                *(
+                    self._update_one_character(world, character, beat_summaries, deltas)
+                    for _, character, deltas in items
+                ),
+                return_exceptions=True,
+            )
+            updated = {}
+            for (char_name, _, _), new_char in zip(items, results):
+                if new_char is None or isinstance(new_char, BaseException):
+                    continue
+                new_char.name = new_char.name or char_name
+                world.characters[char_name] = new_char
+                updated[char_name] = new_char
+        if updated:
+            world.bump_chars_rev()
+        return updated
+
+    async def _update_characters_batched(
+        self,
+        world: NarrativeWorld,
+        items: List[tuple],
+        beat_summaries: str,
+    ) -> Optional[Dict[str, Character]]:
+        """One-call batch update; returns None if the response won't parse."""
+        blocks = [
+            f"### {char_name}\nDOSSIER:\n{character.to_prompt_text()}\n\n"
+            f"DELTAS:\n{_json_dumps_pretty(deltas)}"
+            for char_name, character, deltas in items
+        ]
+        user_prompt = self._prompts.render(
+            "engine",
+            "CHARACTER_STATE_UPDATER_BATCH",
+            beat_summaries=beat_summaries or "(no beats)",
+            character_blocks="\n\n".join(blocks),
+        )
+        try:
+            raw = await self._strong.complete(
+                system_prompt="You keep character dossiers current and consistent.",
+                user_prompt=user_prompt,
+                json_mode=True,
+                max_tokens=2048 * len(items),
+                cacheable_prefix=self._world_prefix(world),
+            )
+            data = _safe_json_loads(raw)
+            parsed = [
+                Character.model_validate(item) for item in data.get("characters", [])
+            ]
+        except (ValueError, json.JSONDecodeError):
+            return None
+        updated: Dict[str, Character] = {}
+        for new_char in parsed:
+            if new_char.name in world.characters:
+                world.characters[new_char.name] = new_char
+                updated[new_char.name] = new_char
+        return updated
+
+    async def _update_one_character(
+        self,
+        world: NarrativeWorld,
+        character: Character,
+        beat_summaries: str,
+        deltas: List[dict],
+    ) -> Optional[Character]:
+        """Single-character update, used when the batch path fails."""
+        user_prompt = self._prompts.render(
+            "engine",
+            "CHARACTER_STATE_UPDATER",
+            character_profile=character.to_prompt_text(),
+            beat_summaries=beat_summaries or "(no beats)",
+            deltas=_json_dumps_pretty(deltas),
+        )
+        try:
+            async with self._char_update_sem:
+                raw = await self._strong.complete(
+                    system_prompt="You keep character dossiers current and consistent.",
+                    user_prompt=user_prompt,
+                    json_mode=True,
+                    max_tokens=2048,
+                    cacheable_prefix=self._world_prefix(world),
+                )
+            return OutputParser.parse(raw, Character)
+        except (ValueError, json.JSONDecodeError):
+            return None
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _current_act(world: NarrativeWorld) -> Act:
+        if not world.acts:
+            raise ValueError(f"World {world.id} has no acts; call plan_act first")
+        return world.acts[-1]
+
+    @staticmethod
+    def _find_scene(world: NarrativeWorld, scene_id: str) -> Optional[EngineScene]:
+        return world.find_scene(scene_id)
+
+    def _cached_text(self, world: NarrativeWorld, kind: str, rev: int, build) -> str:
+        per_world = self._text_cache.setdefault(world.id, {})
+        entry = per_world.get(kind)
+        if entry is not None and entry[0] == rev:
+            return entry[1]
+        text = build(world)
+        per_world[kind] = (rev, text)
+        return text
+
+    def _thread_states_text(self, world: NarrativeWorld) -> str:
+        return self._cached_text(
+            world, "threads", world.threads_rev, self._build_thread_states_text
+        )
+
+    def _characters_text(self, world: NarrativeWorld) -> str:
+        return self._cached_text(
+            world, "chars", world.chars_rev, self._build_characters_text
+        )
+
+    def _accumulated_events_text(self, world: NarrativeWorld) -> str:
+        return self._cached_text(
+            world, "events", world.events_rev, self._build_accumulated_events_text
+        )
+
+    def _prompt_context(self, world: NarrativeWorld) -> PromptContext:
+        """Snapshot the three rendered views for one tick's prompts."""
+        return PromptContext(
+            thread_text=self._thread_states_text(world),
+            chars_text=self._characters_text(world),
+            events_text=self._accumulated_events_text(world),
+        )
+
+    def _world_prefix(self, world: NarrativeWorld) -> str:
+        """The byte-stable head shared by every engine prompt in a tick.
+
+        World seed and cast dossiers change only at act boundaries, so
+        rendering them once per (tccn version, chars rev) and sending them
+        as ``cacheable_prefix`` lets provider prompt caches serve the bulk
+        of every engine call's input tokens.
+        """
+        rev = (world.tccn.prompt_version, world.chars_rev)
+        return self._cached_text(world, "world_prefix", rev, self._build_world_prefix)
+
+    def _build_world_prefix(self, world: NarrativeWorld) -> str:
+        return self._prompts.render(
+            "engine",
+            "WORLD_PREFIX",
+            tcc_context=world.tccn.to_prompt_text(),
+            characters=self._characters_text(world),
+        )
+
+    @staticmethod
+    def _build_thread_states_text(world: NarrativeWorld) -> str:
+        lines = [
+            f"- {ts.thread_name}: {ts.status} — {ts.detail}" for ts in world.thread_states
+        ]
+        return "\n".join(lines) or "(no threads)"
+
+    def _char_idx(self, world: NarrativeWorld) -> _CharIndex:
+        idx = self._char_index.get(world.id)
+        if idx is None or idx.rev != world.chars_rev:
+            idx = _CharIndex(world)
+            self._char_index[world.id] = idx
+        return idx
+
+    def _build_characters_text(self, world: NarrativeWorld) -> str:
+        # Renders come from the character index; each to_prompt_text() is
+        # itself version-cached on the Character (see _PromptTextCached),
+        # so even a cold rebuild only re-renders characters that changed.
+        idx = self._char_idx(world)
+        return "\n\n---\n\n".join(idx.prompt_text_by_name.values()) or "(no characters)"
+
+    @staticmethod
+    def _build_accumulated_events_text(world: NarrativeWorld) -> str:
+        # Only the last 30 entries reach the prompt; the bounded deque
+        # holds exactly that window instead of materializing every event
+        # and beat of the play just to slice the tail.
+        events: deque[str] = deque(maxlen=30)
+        for act in world.acts:
+            events.extend(f"- {we.description}" for we in act.world_events)
+            for scene in act.scenes:
+                events.extend(f"- [Beat] {b.actual_outcome}" for b in scene.beats)
+        return "\n".join(events) or "(no events yet)"
@@ -0,0 +1,377 @@
+"""Provider abstraction for the LLM backends the storyteller talks to.
+
+Two tiers are used throughout the codebase: a "strong" model for prose and
+planning, and a "fast" model for small structured calls (deltas, NPC chatter).
+Concrete adapters (OpenAI, Anthropic, local) implement this interface.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, List, Sequence, Tuple
+
+
+@dataclass(frozen=True)
+class ChainStep:
+    """One step of a dependent completion chain.
+
+    ``user_prompt`` may contain a ``{prev}`` placeholder, replaced with
+    the previous step's completion before the step runs.
+    """
+
+    system_prompt: str
+    user_prompt: str
+    json_mode: bool = False
+    max_tokens: int = 1024
+    cacheable_prefix: str | None = None
+
+
+class LLMProvider(ABC):
+    """Minimal async completion interface shared by all adapters."""
+
+    @abstractmethod
+    async def complete(
+        self,
+        *,
+        system_prompt: str,
+        user_prompt: str,
+        json_mode: bool = False,
+        max_tokens: int = 1024,
+        cacheable_prefix: str | None = None,
+    ) -> str:
+        """Return the model's completion for the given prompts.
+
+        When ``json_mode`` is true, adapters should request the provider's
+        JSON output mode if available; callers still defensively parse.
+
+        ``cacheable_prefix`` is content that is byte-stable across calls
+        and logically precedes ``user_prompt``. Adapters must send it as
+        the head of the user message; providers with explicit cache
+        controls should mark it as a cache breakpoint (e.g. Anthropic
+        ``cache_control: {"type": "ephemeral"}``), while prefix-matching
+        providers benefit from the stable head automatically.
+        """
+        raise NotImplementedError
+
+    async def stream(
+        self,
+        *,
+        system_prompt: str,
+        user_prompt: str,
+        json_mode: bool = False,
+        max_tokens: int = 1024,
+        cacheable_prefix: str | None = None,
+    ) -> AsyncIterator[str]:
+        """Yield the completion incrementally as text chunks.
+
+        Adapters backed by streaming APIs should override this; the
+        default degrades to one chunk holding the full completion, so
+        callers can always consume the streaming interface.
+        """
+        yield await self.complete(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            json_mode=json_mode,
+            max_tokens=max_tokens,
+            cacheable_prefix=cacheable_prefix,
+        )
+
+    async def complete_chain(self, steps: Sequence[ChainStep]) -> List[str]:
+        """Run dependent completions, piping each output into the next.
+
+        Returns every step's completion, in order. The base
+        implementation executes the chain client-side, one ``complete``
+        per step; adapters whose backends can run the plan server-side
+        (co-located orchestrators, assistants-style runs) should
+        override it, since each hop saved is one network round-trip plus
+        one queue wait that the client no longer pays.
+        """
+        results: List[str] = []
+        prev = ""
+        for step in steps:
+            prev = await self.complete(
+                system_prompt=step.system_prompt,
+                user_prompt=step.user_prompt.replace("{prev}", prev),
+                json_mode=step.json_mode,
+                max_tokens=step.max_tokens,
+                cacheable_prefix=step.cacheable_prefix,
+            )
+            results.append(prev)
+        return results
+
+
+class BatchingLLMProvider(LLMProvider):
+    """Coalesces concurrent ``complete`` calls into provider batches.
+
+    Many sessions issuing independent small calls through the same
+    provider each pay their own round-trip. This wrapper holds calls for
+    a short window (default 10ms), then dispatches everything collected
+    as one batch, so provider-side prefill throughput scales with the
+    effective batch size. Callers are unchanged: each still awaits its
+    own ``complete`` and gets its own result or exception.
+
+    The generic interface has no batch endpoint, so the default dispatch
+    fans the batch out with ``asyncio.gather``; adapters whose backends
+    expose a true batch API should subclass and override
+    ``_complete_batch``.
+    """
+
+    def __init__(
+        self,
+        inner: LLMProvider,
+        batch_window_ms: float = 10.0,
+        max_batch: int = 32,
+    ) -> None:
+        self._inner = inner
+        self._window = batch_window_ms / 1000.0
+        self._max_batch = max_batch
+        self._pending: List[Tuple[dict[str, Any], asyncio.Future[str]]] = []
+        self._flusher: asyncio.Task[None] | None = None
+
+    async def complete(
+        self,
+        *,
+        system_prompt: str,
+        user_prompt: str,
+        json_mode: bool = False,
+        max_tokens: int = 1024,
+        cacheable_prefix: str | None = None,
+    ) -> str:
+        future: asyncio.Future[str] = asyncio.get_running_loop().create_future()
+        self._pending.append(
+            (
+                {
+                    "system_prompt": system_prompt,
+                    "user_prompt": user_prompt,
+                    "json_mode": json_mode,
+                    "max_tokens": max_tokens,
+                    "cacheable_prefix": cacheable_prefix,
+                },
+                future,
+            )
+        )
+        if len(self._pending) >= self._max_batch:
+            self._dispatch_pending()
+        elif self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_after_window())
+        return await future
+
+    async def stream(
+        self,
+        *,
+        system_prompt: str,
+        user_prompt: str,
+        json_mode: bool = False,
+        max_tokens: int = 1024,
+        cacheable_prefix: str | None = None,
+    ) -> AsyncIterator[str]:
+        # Streams are latency-sensitive and single-consumer; pass through.
+        async for chunk in self._inner.stream(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            json_mode=json_mode,
+            max_tokens=max_tokens,
+            cacheable_prefix=cacheable_prefix,
+        ):
+            yield chunk
+
+    async def _flush_after_window(self) -> None:
+        await asyncio.sleep(self._window)
+        self._dispatch_pending()
+
+    def _dispatch_pending(self) -> None:
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        asyncio.create_task(self._run_batch(batch))
+
+    async def _run_batch(
+        self, batch: List[Tuple[dict[str, Any], asyncio.Future[str]]]
+    ) -> None:
+        results = await self._complete_batch([kwargs for kwargs, _ in batch])
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def _complete_batch(
+        self, requests: List[dict[str, Any]]
+    ) -> List[str | BaseException]:
+        """Dispatch one collected batch; override for true batch APIs."""
+        return await asyncio.gather(
+            *(self._inner.complete(**kwargs) for kwargs in requests),
+            return_exceptions=True,
+        )
+
+
+class BinnedBatchingLLMProvider(LLMProvider):
+    """Batches completions per expected-output-size bin.
+
+    Mixed workloads interleave short structured calls (deltas, thread
+    updates) with long prose calls. Collected into one batch, the whole
+    batch runs as many decode steps as its longest member, so on
+    self-hosted backends short calls pay the long calls' padding.
+    Requests are binned by ``max_tokens`` (≤512, ≤1024, longer) and each
+    bin batches independently with its own window, so short calls never
+    wait on long ones. Against hosted providers this degrades to a
+    per-bin concurrency shaper, which is harmless.
+    """
+
+    _BIN_EDGES = (512, 1024)
+
+    def __init__(
+        self,
+        inner: LLMProvider,
+        batch_window_ms: float = 10.0,
+        max_batch: int = 32,
+    ) -> None:
+        self._inner = inner
+        self._bins = tuple(
+            BatchingLLMProvider(inner, batch_window_ms, max_batch)
+            for _ in range(len(self._BIN_EDGES) + 1)
+        )
+
+    def _bin_for(self, max_tokens: int) -> BatchingLLMProvider:
+        for i, edge in enumerate(self._BIN_EDGES):
+            if max_tokens <= edge:
+                return self._bins[i]
+        return self._bins[-1]
+
+    async def complete(
+        self,
+        *,
+        system_prompt: str,
+        user_prompt: str,
+        json_mode: bool = False,
+        max_tokens: int = 1024,
+        cacheable_prefix: str | None = None,
+    ) -> str:
+        return await self._bin_for(max_tokens).complete(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            json_mode=json_mode,
+            max_tokens=max_tokens,
+            cacheable_prefix=cacheable_prefix,
+        )
+
+    async def stream(
+        self,
+        *,
+        system_prompt: str,
+        user_prompt: str,
+        json_mode: bool = False,
+        max_tokens: int = 1024,
+        cacheable_prefix: str | None = None,
+    ) -> AsyncIterator[str]:
+        # Streams are latency-sensitive and single-consumer; pass through.
+        async for chunk in self._inner.stream(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            json_mode=json_mode,
+            max_tokens=max_tokens,
+            cacheable_prefix=cacheable_prefix,
+        ):
+            yield chunk
+
+
+class CachedLLMProvider(LLMProvider):
+    """In-process LRU cache of exact-repeat completions.
+
+    Retries, replays of an act after a user abort, and director-mode
+    re-runs often re-issue byte-identical prompts; for those, a dict hit
+    beats a provider round-trip. Responses are cached only when the call
+    site passes ``cacheable=True`` (or the wrapper is built with
+    ``cache_all``) — stochastic calls like dice assessments must opt out
+    so repeat rolls stay independent.
+    """
+
+    def __init__(
+        self,
+        inner: LLMProvider,
+        maxsize: int = 512,
+        cache_all: bool = False,
+    ) -> None:
+        self._inner = inner
+        self._maxsize = maxsize
+        self._cache_all = cache_all
+        self._cache: OrderedDict[bytes, str] = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    async def complete(
+        self,
+        *,
+        system_prompt: str,
+        user_prompt: str,
+        json_mode: bool = False,
+        max_tokens: int = 1024,
+        cacheable_prefix: str | None = None,
+        cacheable: bool = False,
+    ) -> str:
+        if not (cacheable or self._cache_all):
+            return await self._inner.complete(
+                system_prompt=system_prompt,
+                user_prompt=user_prompt,
+                json_mode=json_mode,
+                max_tokens=max_tokens,
+                cacheable_prefix=cacheable_prefix,
+            )
+        key = hashlib.blake2b(
+            "\0".join(
+                (
+                    system_prompt,
+                    cacheable_prefix or "",
+                    user_prompt,
+                    str(json_mode),
+                    str(max_tokens),
+                )
+            ).encode(),
+            digest_size=16,
+        ).digest()
+        hit = self._cache.get(key)
+        if hit is not None:
+            self._cache.move_to_end(key)
+            self._hits += 1
+            return hit
+        self._misses += 1
+        result = await self._inner.complete(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            json_mode=json_mode,
+            max_tokens=max_tokens,
+            cacheable_prefix=cacheable_prefix,
+        )
+        self._cache[key] = result
+        if len(self._cache) > self._maxsize:
+            self._cache.popitem(last=False)
+        return result
+
+    async def stream(
+        self,
+        *,
+        system_prompt: str,
+        user_prompt: str,
+        json_mode: bool = False,
+        max_tokens: int = 1024,
+        cacheable_prefix: str | None = None,
+    ) -> AsyncIterator[str]:
+        # Streams are not cached; pass through.
+        async for chunk in self._inner.stream(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            json_mode=json_mode,
+            max_tokens=max_tokens,
+            cacheable_prefix=cacheable_prefix,
+        ):
+            yield chunk
+
+    def cache_stats(self) -> dict[str, int]:
+        """Hit/miss/size counters for metrics endpoints."""
+        return {"hits": self._hits, "misses": self._misses, "size": len(self._cache)}
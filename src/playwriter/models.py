@@ -0,0 +1,231 @@
+"""Core domain models shared across services.
+
+The TCCN (Teleology / Context / Characters / Narrative threads) document is
+the seed of every play: it states where the story must arrive, the world it
+moves through, who inhabits it, and which threads pull it forward.
+"""
+
+from __future__ import annotations
+
+from functools import cached_property
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
+
+
+class NarrativeThread(BaseModel):
+    """A single thread of intent running through the play."""
+
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
+    name: str
+    description: str = ""
+    tension: str = ""
+
+
+class CharacterSummary(BaseModel):
+    """The sketch of a character as it appears in the TCCN seed."""
+
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
+    name: str
+    role: str = ""
+    summary: str = ""
+    voice_style: str = ""
+
+
+class _PromptTextCached(BaseModel):
+    """Mixin: caches ``to_prompt_text`` output until a field is mutated.
+
+    These models are mutable in principle but change rarely relative to how
+    often they are rendered into prompts (every turn, for every session).
+    Any field assignment bumps ``prompt_version`` and drops the cached text,
+    so the render is paid once per mutation instead of once per call.
+    """
+
+    _cached_prompt_text: Optional[str] = PrivateAttr(default=None)
+    _version: int = PrivateAttr(default=0)
+
+    def __setattr__(self, name: str, value: object) -> None:
+        super().__setattr__(name, value)
+        if not name.startswith("_"):
+            object.__setattr__(self, "_cached_prompt_text", None)
+            object.__setattr__(self, "_version", self._version + 1)
+
+    @property
+    def prompt_version(self) -> int:
+        """Monotonic counter, bumped on every field mutation."""
+        return self._version
+
+    def to_prompt_text(self) -> str:
+        if self._cached_prompt_text is None:
+            object.__setattr__(self, "_cached_prompt_text", self._render_prompt_text())
+        return self._cached_prompt_text  # type: ignore[return-value]
+
+    def _render_prompt_text(self) -> str:
+        raise NotImplementedError
+
+
+class Character(_PromptTextCached):
+    """A fully generated character, ready to be embodied."""
+
+    name: str
+    archetype: str = ""
+    background: str = ""
+    ambitions: List[str] = Field(default_factory=list)
+    relationships: dict[str, str] = Field(default_factory=dict)
+    voice_style: str = ""
+    internal_state: str = ""
+    short_term_memory: List[str] = Field(default_factory=list)
+
+    def apply_delta(self, field: str, change: str) -> None:
+        """Fold one beat delta into the dossier.
+
+        All delta application funnels through here, and every branch
+        assigns the field rather than mutating it in place, so the
+        ``_PromptTextCached`` machinery sees the write, drops the cached
+        prompt text and bumps ``prompt_version`` exactly once per delta.
+        """
+        if field == "internal_state":
+            self.internal_state = change
+        elif field == "ambitions":
+            self.ambitions = self.ambitions + [change]
+        elif field == "relationships":
+            name, _, note = change.partition(":")
+            if name.strip() and note.strip():
+                self.relationships = {**self.relationships, name.strip(): note.strip()}
+            else:
+                self.short_term_memory = (self.short_term_memory + [change])[-8:]
+        else:
+            # short_term_memory, and the catch-all for fields the fast
+            # model invents: remember it rather than drop it.
+            self.short_term_memory = (self.short_term_memory + [change])[-8:]
+
+    def _render_prompt_text(self) -> str:
+        """Render the character as a prompt-ready profile block."""
+        lines = [f"Name: {self.name}"]
+        if self.archetype:
+            lines.append(f"Archetype: {self.archetype}")
+        if self.background:
+            lines.append(f"Background: {self.background}")
+        if self.ambitions:
+            lines.append("Ambitions: " + "; ".join(self.ambitions))
+        if self.relationships:
+            lines.append(
+                "Relationships: "
+                + "; ".join(f"{k}: {v}" for k, v in self.relationships.items())
+            )
+        if self.voice_style:
+            lines.append(f"Voice: {self.voice_style}")
+        if self.internal_state:
+            lines.append(f"Internal state: {self.internal_state}")
+        if self.short_term_memory:
+            lines.append("Recent memory: " + " | ".join(self.short_term_memory))
+        return "\n".join(lines)
+
+
+class TCCN(_PromptTextCached):
+    """Teleology / Context / Characters / Narrative-threads seed document."""
+
+    title: str
+    teleology: str
+    context: str
+    characters: List[CharacterSummary] = Field(default_factory=list)
+    narrative_threads: List[NarrativeThread] = Field(default_factory=list)
+
+    def _render_prompt_text(self) -> str:
+        """Render the full TCCN as a prompt context block."""
+        parts = [
+            f"TITLE: {self.title}",
+            f"TELEOLOGY (where the story must arrive):\n{self.teleology}",
+            f"CONTEXT:\n{self.context}",
+        ]
+        if self.characters:
+            parts.append(
+                "CHARACTERS:\n"
+                + "\n".join(
+                    f"- {c.name} ({c.role}): {c.summary}" for c in self.characters
+                )
+            )
+        if self.narrative_threads:
+            parts.append(
+                "NARRATIVE THREADS:\n"
+                + "\n".join(
+                    f"- {t.name}: {t.description}" for t in self.narrative_threads
+                )
+            )
+        return "\n\n".join(parts)
+
+
+class SceneAction(BaseModel):
+    """One planned action within a scene, attributed to an actor."""
+
+    actor: str = ""
+    action: str
+
+
+class Scene(BaseModel):
+    """A composed scene: setting, cast, threads in play, planned actions."""
+
+    number: int
+    setting: str = ""
+    actors: List[str] = Field(default_factory=list)
+    narrative_threads: List[str] = Field(default_factory=list)
+    actions: List[SceneAction] = Field(default_factory=list)
+    full_prose: Optional[str] = None
+
+    def __setattr__(self, name: str, value: object) -> None:
+        # Mutating a scene drops its cached prompt descriptions.
+        super().__setattr__(name, value)
+        self.__dict__.pop("prompt_description_full", None)
+        self.__dict__.pop("prompt_description_short", None)
+
+    @cached_property
+    def prompt_description_full(self) -> str:
+        """Scene header with cast, as embedded in GM prompts.
+
+        Pure function of the scene; computed once rather than re-joined
+        every turn of every session staging this scene.
+        """
+        return f"Scene {self.number}: {self.setting}. Actors: {', '.join(self.actors)}"
+
+    @cached_property
+    def prompt_description_short(self) -> str:
+        """Scene header without cast, as embedded in NPC prompts."""
+        return f"Scene {self.number}: {self.setting}"
+
+
+class Place(BaseModel):
+    """A designed location the play can stage scenes in."""
+
+    name: str
+    description: str = ""
+
+
+class Trope(BaseModel):
+    """A narrative trope drawn from the trope corpus."""
+
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
+    trope_id: str
+    name: str
+    description: str = ""
+
+    @cached_property
+    def short_line(self) -> str:
+        """Prompt bullet with a truncated description, computed once.
+
+        Tropes are drawn repeatedly from a static pool, so the slice and
+        f-string are paid once per trope instead of once per prompt.
+        """
+        return f"- {self.name}: {self.description[:200]}"
+
+
+class TropeSample(BaseModel):
+    """A sampled set of tropes injected into a generation prompt."""
+
+    tropes: List[Trope] = Field(default_factory=list)
+    source: str = "random"
+
+    def to_prompt_text(self) -> str:
+        return "\n".join(f"- {t.name}: {t.description}" for t in self.tropes)
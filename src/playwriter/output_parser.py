@@ -0,0 +1,73 @@
+"""Parsing of structured LLM output into Pydantic models.
+
+LLMs wrap JSON in prose, code fences, or both; ``OutputParser`` tries the
+cheap direct parse first and degrades gracefully through fence extraction
+and brace scanning before giving up.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Type, TypeVar
+
+import orjson
+from pydantic import BaseModel, ValidationError
+
+T = TypeVar("T", bound=BaseModel)
+
+# Compiled once at import: re's internal pattern cache is small and can be
+# evicted under load, and this runs for every structured LLM response.
+_FENCE_RE = re.compile(r"```(?:json)?\s*\n?(.*?)```", re.DOTALL)
+
+
+class OutputParser:
+    """Turns raw LLM text into validated model instances."""
+
+    @classmethod
+    def parse(cls, text: str, model: Type[T]) -> T:
+        """Parse ``text`` as JSON for ``model``, tolerating fences and prose."""
+        stripped = text.strip()
+        try:
+            return model.model_validate_json(stripped)
+        except ValidationError:
+            pass
+
+        match = _FENCE_RE.search(text)
+        if match:
+            candidate = match.group(1).strip()
+            try:
+                return model.model_validate(orjson.loads(candidate))
+            except (orjson.JSONDecodeError, ValidationError):
+                pass
+
+        start = stripped.find("{")
+        end = stripped.rfind("}")
+        if start != -1 and end > start:
+            candidate = stripped[start : end + 1]
+            return model.model_validate(orjson.loads(candidate))
+
+        raise ValueError(f"Could not parse LLM output as {model.__name__}")
+
+    @classmethod
+    def format_instructions(cls, model: Type[BaseModel]) -> str:
+        """Return instructions telling the LLM to emit JSON for ``model``.
+
+        The schema is emitted compact: the model reads field names, not
+        whitespace, and indentation roughly doubles the token count.
+        """
+        schema_str = orjson.dumps(model.model_json_schema()).decode()
+        return (
+            "Respond ONLY with a JSON object matching this schema "
+            "(no prose, no code fences):\n" + schema_str
+        )
+
+    @classmethod
+    def format_instructions_pretty(cls, model: Type[BaseModel]) -> str:
+        """Indented variant of :meth:`format_instructions`, for debug logs."""
+        schema_str = orjson.dumps(
+            model.model_json_schema(), option=orjson.OPT_INDENT_2
+        ).decode()
+        return (
+            "Respond ONLY with a JSON object matching this schema "
+            "(no prose, no code fences):\n" + schema_str
+        )
@@ -0,0 +1,103 @@
+"""Prompt template loading and rendering.
+
+Templates live next to this module as ``<category>/<NAME>.txt`` files with
+``{placeholder}`` variables. Rendering is deliberately forgiving: unknown
+placeholders are left in place so partially-rendered templates can be
+composed in stages. Literal braces in template text must be escaped as
+``{{`` / ``}}`` (constant values are escaped automatically when baked in).
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from pathlib import Path
+
+
+class _SafeMap(dict):
+    """format_map helper that leaves unknown placeholders intact."""
+
+    def __missing__(self, key: str) -> str:
+        return "{" + key + "}"
+
+
+class PromptLoader:
+    """Loads and renders prompt templates from a directory tree."""
+
+    def __init__(
+        self,
+        prompts_dir: Path | str | None = None,
+        constants: dict[str, str] | None = None,
+    ) -> None:
+        self._dir = Path(prompts_dir) if prompts_dir is not None else Path(__file__).parent
+        self._constants = dict(constants) if constants else {}
+        self._cache: dict[str, str] = {}
+        # Rendered-output LRU. Services routinely re-render a template
+        # with identical variables (same seed across a chain, same scene
+        # across retries); when the variables are hashable the finished
+        # render is reused instead of re-running format_map.
+        self._render_cache: OrderedDict[tuple, str] = OrderedDict()
+        self._render_cache_max = 256
+        # The template tree is small and fully enumerable; read it all up
+        # front so no lazy disk I/O lands in the middle of the async hot
+        # path later. `load` stays as a dict-get with a lazy fallback for
+        # templates dropped in after construction. Constants (placeholders
+        # whose value never changes for the process, e.g. baked format
+        # instructions) are substituted once here rather than per render.
+        for p in self._dir.rglob("*.txt"):
+            self._cache[f"{p.parent.name}/{p.stem}"] = self._apply_constants(
+                p.read_text(encoding="utf-8")
+            )
+
+    def _apply_constants(self, template: str) -> str:
+        # Constant values (e.g. JSON schemas) routinely contain braces;
+        # escape them so the single format_map pass in render treats them
+        # as literal text.
+        for k, v in self._constants.items():
+            template = template.replace(
+                "{" + k + "}", v.replace("{", "{{").replace("}", "}}")
+            )
+        return template
+
+    def load(self, category: str, name: str) -> str:
+        """Return the raw template text for ``category/name``."""
+        key = f"{category}/{name}"
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+        path = self._dir / category / f"{name}.txt"
+        if not path.is_file():
+            raise FileNotFoundError(f"No prompt template {key!r} under {self._dir}")
+        text = self._apply_constants(path.read_text(encoding="utf-8"))
+        self._cache[key] = text
+        return text
+
+    def render(self, category: str, name: str, **variables: object) -> str:
+        """Render a template, substituting ``{key}`` placeholders.
+
+        Unknown placeholders are preserved verbatim so callers can layer
+        renders (e.g. fill world context first, per-turn fields later).
+        One C-level format_map pass replaces the old per-variable replace
+        loop, so render cost is O(len(template)) regardless of how many
+        variables are supplied.
+        """
+        template = self.load(category, name)
+        if "{" not in template:
+            # Brace-free templates (static prompts) need no format pass.
+            # Guarded on "{" rather than on variables: templates with
+            # escaped ``{{`` still need format_map to collapse them.
+            return template
+        try:
+            key = (category, name, tuple(sorted(variables.items())))
+            hash(key)
+        except TypeError:
+            # Unhashable variable value: render without memoizing.
+            return template.format_map(_SafeMap(variables))
+        cached = self._render_cache.get(key)
+        if cached is not None:
+            self._render_cache.move_to_end(key)
+            return cached
+        rendered = template.format_map(_SafeMap(variables))
+        self._render_cache[key] = rendered
+        if len(self._render_cache) > self._render_cache_max:
+            self._render_cache.popitem(last=False)
+        return rendered
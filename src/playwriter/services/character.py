@@ -0,0 +1,163 @@
+"""Character generation, refinement and embodiment.
+
+``CharacterService`` turns TCCN character sketches into full ``Character``
+models and can then *embody* one: an embodiment session keeps a sliding
+window of conversation so the character can be chatted with in voice.
+"""
+
+from __future__ import annotations
+
+import secrets
+from collections import deque, namedtuple
+from dataclasses import dataclass
+from typing import Deque, Optional
+
+from ..llm import LLMProvider
+from ..models import TCCN, Character, CharacterSummary
+from ..output_parser import OutputParser
+from ..prompts import PromptLoader
+
+
+Msg = namedtuple("Msg", "role speaker content")
+
+
+class ConversationMemory:
+    """Sliding window of conversation turns, rendered as prompt text.
+
+    Turns are stored structured (role, speaker, content) and formatted
+    only when serialized, so callers pass raw strings instead of
+    pre-building ``[Speaker]: content`` prefixes, and downstream
+    consumers that want structure (embedding caches, exports) can read
+    ``messages`` without re-parsing prompt text.
+
+    The rendered window is maintained incrementally: ``add_message``
+    appends the new line to the cached text (and trims the evicted head
+    line when the window is full), so per-turn cost is proportional to
+    the new message, not to the whole window.
+    """
+
+    def __init__(self, window_size: int = 50) -> None:
+        self._buf: Deque[Msg] = deque(maxlen=window_size)
+        # Serialized lines, evicted in lockstep with _buf, so the cached
+        # text can be trimmed by the evicted line's exact length.
+        self._lines: Deque[str] = deque(maxlen=window_size)
+        self._text_cache: Optional[str] = None
+
+    @property
+    def messages(self) -> Deque[Msg]:
+        return self._buf
+
+    def add_message(self, role: str, speaker: str, content: str) -> None:
+        line = f"[{speaker}]: {content}"
+        if self._text_cache is not None:
+            if len(self._buf) == self._buf.maxlen:
+                evicted = self._lines[0]
+                self._text_cache = self._text_cache[len(evicted) + 1 :]
+            self._text_cache = f"{self._text_cache}\n{line}" if self._text_cache else line
+        self._buf.append(Msg(role, speaker, content))
+        self._lines.append(line)
+
+    def to_prompt_text(self) -> str:
+        if self._text_cache is None:
+            self._text_cache = "\n".join(self._lines)
+        return self._text_cache
+
+
+@dataclass(slots=True)
+class _EmbodimentSession:
+    """Live embodiment of a character: its profile, prompt, and memory."""
+
+    character: Character
+    system_prompt: str
+    memory: ConversationMemory
+
+
+class CharacterService:
+    """Generates, refines and embodies characters."""
+
+    def __init__(self, llm: LLMProvider, prompts: PromptLoader | None = None) -> None:
+        self._llm = llm
+        # The Character schema is static for the process; bake its format
+        # instructions into the templates at load time instead of building
+        # and substituting the JSON schema on every generate/refine call.
+        self._prompts = prompts or PromptLoader(
+            constants={
+                "format_instructions_character": OutputParser.format_instructions(Character)
+            }
+        )
+        self._sessions: dict[str, _EmbodimentSession] = {}
+
+    async def generate(self, tccn: TCCN, character_summary: CharacterSummary) -> Character:
+        """Generate a full character from its TCCN sketch."""
+        user_prompt = self._prompts.render(
+            "generators",
+            "CHARACTER_GENERATOR",
+            tcc_context=tccn.to_prompt_text(),
+            character_name=character_summary.name,
+            character_summary=character_summary.summary,
+        )
+        raw = await self._llm.complete(
+            system_prompt="You are a master dramatist building a character dossier.",
+            user_prompt=user_prompt,
+            json_mode=True,
+            max_tokens=2048,
+        )
+        character = OutputParser.parse(raw, Character)
+        character.name = character.name or character_summary.name
+        return character
+
+    async def refine(self, tccn: TCCN, character: Character) -> Character:
+        """Run one refinement pass over a generated character."""
+        user_prompt = self._prompts.render(
+            "generators",
+            "CHARACTER_REFINER",
+            tcc_context=tccn.to_prompt_text(),
+            character_profile=character.to_prompt_text(),
+        )
+        raw = await self._llm.complete(
+            system_prompt="You are a master dramatist deepening a character dossier.",
+            user_prompt=user_prompt,
+            json_mode=True,
+            max_tokens=2048,
+        )
+        refined = OutputParser.parse(raw, Character)
+        refined.name = refined.name or character.name
+        return refined
+
+    def embody(self, character: Character, tccn: TCCN | None = None) -> str:
+        """Open an embodiment session for ``character``; returns session id."""
+        system_prompt = self._prompts.render(
+            "embodiers",
+            "CHARACTER_EMBODIER",
+            tcc_context=tccn.to_prompt_text() if tccn else "",
+            character_profile=character.to_prompt_text(),
+            scene_description="",
+        )
+        session_id = secrets.token_hex(6)
+        while session_id in self._sessions:
+            session_id = secrets.token_hex(6)
+        self._sessions[session_id] = _EmbodimentSession(
+            character=character,
+            system_prompt=system_prompt,
+            memory=ConversationMemory(),
+        )
+        return session_id
+
+    async def chat(self, session_id: str, message: str) -> str:
+        """Send one user message to an embodied character and get the reply."""
+        session = self._sessions.get(session_id)
+        if session is None:
+            raise ValueError(f"Unknown embodiment session: {session_id}")
+        session.memory.add_message("user", "User", message)
+        reply = await self._llm.complete(
+            system_prompt=session.system_prompt,
+            user_prompt=(
+                f"Conversation so far:\n{session.memory.to_prompt_text()}\n\n"
+                f"Reply in character as {session.character.name}."
+            ),
+        )
+        session.memory.add_message("assistant", session.character.name, reply)
+        return reply
+
+    def end_embodiment(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
@@ -0,0 +1,399 @@
+"""The stochastic layer: literary fate as dice.
+
+Every beat of the play is resolved against a d100 roll, shifted by *fate
+modifiers* — bonuses and penalties the active tropes impose on the acting
+character. An LLM assesses the modifiers; the dice decide the rest.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from bisect import bisect_left
+from enum import Enum
+from functools import cached_property
+from pathlib import Path
+from typing import ClassVar, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel, ConfigDict, Field, field_serializer
+
+from ..llm import LLMProvider
+from ..models import Trope
+from ..output_parser import OutputParser
+from ..prompts import PromptLoader
+
+
+class DiceOutcome(str, Enum):
+    """Qualitative bands of a resolved d100 roll."""
+
+    CATASTROPHIC_FAILURE = "catastrophic_failure"
+    FAILURE = "failure"
+    MIXED = "mixed"
+    SUCCESS = "success"
+    CRITICAL_SUCCESS = "critical_success"
+
+
+class FateModifier(BaseModel):
+    """One trope-imposed shift on a roll, with its rationale."""
+
+    model_config = ConfigDict(frozen=True)
+
+    trope_name: str
+    modifier: int = 0
+    rationale: str = ""
+
+
+class FateAssessment(BaseModel):
+    """LLM response wrapper for a list of fate modifiers."""
+
+    modifiers: List[FateModifier] = Field(default_factory=list)
+
+
+class PlannedBeat(BaseModel):
+    """A beat awaiting resolution: who tries what, under which tropes."""
+
+    actor: str
+    action: str
+    tropes: List[Trope] = Field(default_factory=list)
+
+
+class FateAssessmentItem(BaseModel):
+    """One numbered entry of a batched fate assessment."""
+
+    index: int
+    modifiers: List[FateModifier] = Field(default_factory=list)
+
+
+class FateAssessmentBatch(BaseModel):
+    """LLM response wrapper for a scene-level batched assessment."""
+
+    results: List[FateAssessmentItem] = Field(default_factory=list)
+
+
+class DiceRoll(BaseModel):
+    """A fully resolved roll: raw die, fate shifts, final value and band."""
+
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
+    # Serializing every per-beat modifier list balloons NarrativeWorld
+    # dumps over long runs; most consumers only need the summed shift.
+    # Flip this class flag for full-provenance runs.
+    include_modifiers_in_dump: ClassVar[bool] = False
+
+    raw_roll: int
+    final_value: int
+    outcome: DiceOutcome
+    total_modifier: int = 0
+    fate_modifiers: Optional[List[FateModifier]] = None
+
+    @cached_property
+    def fate_text(self) -> str:
+        """Rendered fate-modifier block, computed once per roll.
+
+        The roll is frozen after resolution, so every prompt that shows
+        the same roll shares one render.
+        """
+        modifiers = self.fate_modifiers or []
+        return (
+            "\n".join(
+                f"- {m.trope_name}: {m.modifier:+d} — {m.rationale}" for m in modifiers
+            )
+            or "(no fate modifiers)"
+        )
+
+    @cached_property
+    def fate_dicts(self) -> List[dict]:
+        """Serialized fate modifiers, computed once per roll."""
+        return [m.model_dump() for m in (self.fate_modifiers or [])]
+
+    @field_serializer("fate_modifiers")
+    def _serialize_fate_modifiers(
+        self, value: Optional[List[FateModifier]]
+    ) -> Optional[List[FateModifier]]:
+        return value if self.include_modifiers_in_dump else None
+
+
+# Outcome thresholds: final value v maps to the band whose threshold it is
+# below (1-5 catastrophic, 6-30 failure, 31-60 mixed, 61-90 success,
+# 91-100 critical). bisect over the sorted table keeps this branchless and
+# ready for np.searchsorted if rolls are ever classified in batches.
+_THRESHOLDS = (5, 30, 60, 90)
+_THRESHOLDS_ARR = np.array(_THRESHOLDS, dtype=np.int16)
+_OUTCOMES = (
+    DiceOutcome.CATASTROPHIC_FAILURE,
+    DiceOutcome.FAILURE,
+    DiceOutcome.MIXED,
+    DiceOutcome.SUCCESS,
+    DiceOutcome.CRITICAL_SUCCESS,
+)
+
+
+class DiceService:
+    """Rolls, classifies, and fate-modifies beat resolutions."""
+
+    def __init__(
+        self,
+        llm: LLMProvider,
+        prompts: PromptLoader | None = None,
+        modifier_cache_path: Path | str | None = None,
+        seed: int | None = None,
+    ) -> None:
+        self._llm = llm
+        self._prompts = prompts or PromptLoader()
+        # One Generator for all rolls: batch draws amortize the per-call
+        # overhead and a single seed point makes runs reproducible.
+        self._rng = np.random.default_rng(seed)
+        # Fate assessments repeat heavily: the trope pool is static per
+        # world and actions cluster around a few phrasings. Memoize by
+        # (sorted trope ids, normalized action) so repeat assessments are a
+        # dict hit instead of an LLM round-trip; optionally persist so a
+        # long-running campaign warms across sessions.
+        self._modifier_cache: dict[Tuple[Tuple[str, ...], str], List[FateModifier]] = {}
+        self._modifier_cache_path = (
+            Path(modifier_cache_path) if modifier_cache_path is not None else None
+        )
+        # Write-behind state for the persistent cache: misses mark it
+        # dirty and a debounced task persists it off the event loop.
+        self._cache_dirty = False
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_delay = 1.0
+        self._load_modifier_cache()
+
+    @staticmethod
+    def _normalize_action(action: str) -> str:
+        return action.strip().lower()[:60]
+
+    def _load_modifier_cache(self) -> None:
+        path = self._modifier_cache_path
+        if path is None or not path.is_file():
+            return
+        try:
+            raw = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return
+        for entry in raw:
+            key = (tuple(entry["tropes"]), entry["action"])
+            self._modifier_cache[key] = [
+                FateModifier.model_validate(m) for m in entry["modifiers"]
+            ]
+
+    def _schedule_cache_flush(self) -> None:
+        """Mark the persistent cache dirty and flush it soon.
+
+        Rewriting the whole file on every miss was O(cache^2) total
+        bytes and synchronous file I/O inside the event loop. A miss
+        now just sets a dirty flag; a debounced task (same flush-after-
+        window shape as the batching provider) serializes the cache in
+        a worker thread once the burst settles. ``flush`` forces the
+        write for shutdown paths.
+        """
+        if self._modifier_cache_path is None:
+            return
+        self._cache_dirty = True
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Sync caller: nothing to defer onto, write inline.
+            self._cache_dirty = False
+            self._write_modifier_cache()
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_after_delay())
+
+    async def _flush_after_delay(self) -> None:
+        await asyncio.sleep(self._flush_delay)
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Persist any unwritten modifier-cache entries now."""
+        if self._modifier_cache_path is None or not self._cache_dirty:
+            return
+        self._cache_dirty = False
+        await asyncio.to_thread(self._write_modifier_cache)
+
+    def _write_modifier_cache(self) -> None:
+        path = self._modifier_cache_path
+        if path is None:
+            return
+        payload = [
+            {
+                "tropes": list(tropes),
+                "action": action,
+                "modifiers": [m.model_dump() for m in modifiers],
+            }
+            for (tropes, action), modifiers in self._modifier_cache.items()
+        ]
+        try:
+            path.write_text(json.dumps(payload), encoding="utf-8")
+        except OSError:
+            pass
+
+    def roll_d100(self) -> int:
+        return int(self._rng.integers(1, 101))
+
+    def roll_d100_batch(self, n: int) -> np.ndarray:
+        """Draw ``n`` d100 values in one vectorized call."""
+        return self._rng.integers(1, 101, size=n, dtype=np.int16)
+
+    @staticmethod
+    def classify_outcome_batch(values: np.ndarray) -> List[DiceOutcome]:
+        """Classify an array of final values via one searchsorted pass."""
+        return [_OUTCOMES[i] for i in np.searchsorted(_THRESHOLDS_ARR, values)]
+
+    @staticmethod
+    def classify_outcome(value: int) -> DiceOutcome:
+        """Map a final roll value onto its qualitative outcome band."""
+        return _OUTCOMES[bisect_left(_THRESHOLDS, value)]
+
+    async def assess_fate_modifiers(
+        self,
+        actor: str,
+        action: str,
+        tropes: List[Trope],
+        scene_context: str = "",
+    ) -> List[FateModifier]:
+        """Ask the LLM how the active tropes bend fate for this action.
+
+        Results are memoized by (tropes, normalized action); only cache
+        misses pay the LLM round-trip.
+        """
+        cache_key = (
+            tuple(sorted(t.trope_id for t in tropes)),
+            self._normalize_action(action),
+        )
+        cached = self._modifier_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        tropes_text = "\n".join(t.short_line for t in tropes)
+        user_prompt = self._prompts.render(
+            "generators",
+            "FATE_MODIFIER_ASSESSOR",
+            actor=actor,
+            action=action,
+            tropes_text=tropes_text,
+            scene_context=scene_context,
+            format_instructions=OutputParser.format_instructions(FateAssessment),
+        )
+        raw = await self._llm.complete(
+            system_prompt=(
+                "You are literary fate. Given active tropes and an attempted "
+                "action, you assign each trope a modifier from -30 to +30."
+            ),
+            user_prompt=user_prompt,
+            json_mode=True,
+        )
+        modifiers = OutputParser.parse(raw, FateAssessment).modifiers
+        self._modifier_cache[cache_key] = modifiers
+        self._schedule_cache_flush()
+        return modifiers
+
+    async def assess_fate_modifiers_batch(
+        self,
+        items: List[PlannedBeat],
+        scene_context: str = "",
+    ) -> List[List[FateModifier]]:
+        """Assess fate for all planned beats of a scene in one LLM call.
+
+        The scene context is shared across beats, so one numbered prompt
+        replaces a round-trip per beat. Items already in the modifier
+        cache are answered locally; only misses go to the LLM.
+        """
+        results: List[Optional[List[FateModifier]]] = [None] * len(items)
+        miss_indices: List[int] = []
+        keys = []
+        for i, item in enumerate(items):
+            key = (
+                tuple(sorted(t.trope_id for t in item.tropes)),
+                self._normalize_action(item.action),
+            )
+            keys.append(key)
+            cached = self._modifier_cache.get(key)
+            if cached is not None:
+                results[i] = cached
+            else:
+                miss_indices.append(i)
+
+        if miss_indices:
+            blocks = []
+            for i in miss_indices:
+                item = items[i]
+                tropes_text = "\n".join(t.short_line for t in item.tropes)
+                blocks.append(
+                    f"ITEM {i}:\nActor: {item.actor}\nAction: {item.action}\n"
+                    f"Tropes:\n{tropes_text}"
+                )
+            user_prompt = self._prompts.render(
+                "generators",
+                "FATE_MODIFIER_ASSESSOR_BATCH",
+                scene_context=scene_context,
+                items_text="\n\n".join(blocks),
+                format_instructions=OutputParser.format_instructions(FateAssessmentBatch),
+            )
+            raw = await self._llm.complete(
+                system_prompt=(
+                    "You are literary fate. For each numbered item, assign every "
+                    "listed trope a modifier from -30 to +30 for that action."
+                ),
+                user_prompt=user_prompt,
+                json_mode=True,
+                max_tokens=2048,
+            )
+            parsed = OutputParser.parse(raw, FateAssessmentBatch)
+            by_index = {r.index: r.modifiers for r in parsed.results}
+            for i in miss_indices:
+                modifiers = by_index.get(i, [])
+                results[i] = modifiers
+                self._modifier_cache[keys[i]] = modifiers
+            self._schedule_cache_flush()
+
+        return [r if r is not None else [] for r in results]
+
+    async def resolve_scene(
+        self,
+        beats: List[PlannedBeat],
+        scene_context: str = "",
+    ) -> List[DiceRoll]:
+        """Resolve all planned beats of a scene with a single assessment call.
+
+        Rolls, clamps and classifications are vectorized over the scene.
+        """
+        modifier_lists = await self.assess_fate_modifiers_batch(beats, scene_context)
+        totals = np.fromiter(
+            (sum(m.modifier for m in modifiers) for modifiers in modifier_lists),
+            dtype=np.int32,
+            count=len(modifier_lists),
+        )
+        raws = self.roll_d100_batch(len(beats))
+        finals = np.clip(raws + totals, 1, 100)
+        outcomes = self.classify_outcome_batch(finals)
+        return [
+            DiceRoll(
+                raw_roll=int(raws[i]),
+                final_value=int(finals[i]),
+                outcome=outcomes[i],
+                total_modifier=int(totals[i]),
+                fate_modifiers=modifier_lists[i],
+            )
+            for i in range(len(beats))
+        ]
+
+    async def resolve_action(
+        self,
+        actor: str,
+        action: str,
+        tropes: List[Trope],
+        scene_context: str = "",
+    ) -> DiceRoll:
+        """Resolve one action: assess fate, roll, clamp, classify."""
+        modifiers = await self.assess_fate_modifiers(actor, action, tropes, scene_context)
+        total_modifier = sum(m.modifier for m in modifiers)
+        raw_roll = self.roll_d100()
+        final_value = max(1, min(100, raw_roll + total_modifier))
+        return DiceRoll(
+            raw_roll=raw_roll,
+            final_value=final_value,
+            outcome=self.classify_outcome(final_value),
+            total_modifier=total_modifier,
+            fate_modifiers=modifiers,
+        )
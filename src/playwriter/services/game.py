@@ -0,0 +1,629 @@
+"""Interactive play: a Game Master and embodied NPCs around a shared table.
+
+``GameService`` hosts live sessions where a player, a GM voice (strong
+model) and any number of NPCs (fast model) take turns against a shared
+conversation memory, all grounded in the session's TCCN and current scene.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import secrets
+import sys
+import time
+from collections import deque
+from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+from typing import AsyncIterator, Deque, Dict, List, Optional
+
+import orjson
+from pydantic import BaseModel, ConfigDict, Field
+
+from ..llm import LLMProvider
+from ..models import TCCN, Character, Scene
+from ..prompts import PromptLoader
+from .character import ConversationMemory
+
+_UTC = timezone.utc
+
+# Roles come from a three-word vocabulary; interning shares one string
+# object across all messages and enables pointer-fast equality checks.
+_ROLE_PLAYER = sys.intern("player")
+_ROLE_GM = sys.intern("game_master")
+_ROLE_NPC = sys.intern("npc")
+
+# Constant prompt fragments, hoisted so per-turn assembly is a join over
+# a known-length tuple (one C-level pass, one allocation) instead of an
+# f-string re-copying kilobytes of history each turn.
+_HISTORY_HEADER = "Conversation so far:\n"
+_GM_SUFFIX = "\n\nAs the Game Master, advance the story with a short narration."
+
+
+class GameMessage(BaseModel):
+    """One turn of table talk: who said it, in which role, and when."""
+
+    # Frozen: messages are write-once, which lets pydantic-core skip
+    # assignment validation and keeps per-turn instances compact.
+    model_config = ConfigDict(frozen=True)
+
+    role: str
+    speaker: str
+    content: str
+    # Nanoseconds since the epoch. time.time_ns() is an int and skips the
+    # per-message datetime allocation + tz conversion; ordering only needs
+    # monotonic-enough wall time. Convert lazily via .datetime.
+    timestamp: int
+
+    @property
+    def datetime(self) -> datetime:
+        """The timestamp as an aware UTC datetime, built on demand."""
+        return datetime.fromtimestamp(self.timestamp / 1e9, _UTC)
+
+    def to_json(self) -> bytes:
+        """Serialize for wire transport, bypassing the pydantic walk.
+
+        History dumps on streaming endpoints are hot; building the dict
+        by hand and handing it to orjson skips pydantic's model-to-dict
+        traversal entirely.
+        """
+        return orjson.dumps(
+            {
+                "role": self.role,
+                "speaker": self.speaker,
+                "content": self.content,
+                "ts": self.timestamp,
+            }
+        )
+
+
+class GameSession(BaseModel):
+    """Public state of one running game session."""
+
+    id: str
+    tccn: TCCN
+    characters: Dict[str, Character] = Field(default_factory=dict)
+    scene: Optional[Scene] = None
+    # Bounded ring of recent turns: append+evict is O(1) and a long
+    # session's working set stays constant. Evicted messages can be
+    # spilled to an append-only log by the service, so nothing is lost.
+    history: Deque[GameMessage] = Field(default_factory=deque)
+
+
+class _GameState:
+    """Server-side state for a session: the session plus working caches."""
+
+    __slots__ = ("session", "shared_memory", "prompt_cache", "cached_history_len")
+
+    def __init__(self, session: GameSession) -> None:
+        self.session = session
+        self.shared_memory = ConversationMemory()
+        # Offset into the rendered history up to which previous calls have
+        # already sent (and providers may have cached) the prefix; each
+        # turn only the suffix past this point rides in the prompt tail.
+        self.cached_history_len = 0
+        # Rendered system prompts, keyed by (kind, character_name, scene
+        # number). TCCN text and character profiles are stable across
+        # turns, so re-rendering them every gm_action/npc_respond is pure
+        # waste; the cache is cleared when the scene changes.
+        self.prompt_cache: dict[tuple, str] = {}
+
+
+@lru_cache(maxsize=1024)
+def _render_embodier(
+    prompts: PromptLoader,
+    template_name: str,
+    tcc_text: str,
+    character_profile: str,
+    scene_desc: str,
+) -> str:
+    """Process-wide cache of rendered embodier prompts.
+
+    Thousands of concurrent sessions over the same TCCN re-render
+    identical GM/NPC system prompts; caching by content means they all
+    share a single string object. Small results are interned so equal
+    prompts dedupe in the intern table as well.
+    """
+    rendered = prompts.render(
+        "embodiers",
+        template_name,
+        tcc_context=tcc_text,
+        character_profile=character_profile,
+        scene_description=scene_desc,
+    )
+    return sys.intern(rendered) if len(rendered) <= 4096 else rendered
+
+
+class GameService:
+    """Runs interactive sessions over a strong (GM) and fast (NPC) model."""
+
+    def __init__(
+        self,
+        strong_llm: LLMProvider,
+        fast_llm: LLMProvider,
+        prompts: PromptLoader | None = None,
+        strong_concurrency: int = 4,
+        fast_concurrency: int = 8,
+        history_log_dir: Path | str | None = None,
+    ) -> None:
+        self._strong = strong_llm
+        self._fast = fast_llm
+        self._prompts = prompts or PromptLoader()
+        self._history_log_dir = (
+            Path(history_log_dir) if history_log_dir is not None else None
+        )
+        self._sessions: dict[str, _GameState] = {}
+        # Per-provider concurrency bounds: many sessions (or an NPC
+        # chorus) must not blow through provider rate limits.
+        self._strong_sem = asyncio.Semaphore(strong_concurrency)
+        self._fast_sem = asyncio.Semaphore(fast_concurrency)
+        # Identical simultaneous requests share one in-flight call.
+        self._inflight: dict[bytes, asyncio.Task[str]] = {}
+        # Spilled history frames are funneled through a queue to a single
+        # background writer that batches them into one write per drain,
+        # keeping file I/O latency out of the turn path entirely.
+        self._log_q: asyncio.Queue[tuple[Path, str]] | None = None
+        self._log_task: asyncio.Task[None] | None = None
+
+    async def _log_writer(self) -> None:
+        assert self._log_q is not None
+        q = self._log_q
+        while True:
+            path, line = await q.get()
+            batch: dict[Path, list[str]] = {path: [line]}
+            pending = 1
+            # Drain whatever else is queued so bursts become one write.
+            while pending < 64:
+                try:
+                    path, line = q.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                batch.setdefault(path, []).append(line)
+                pending += 1
+            for path, lines in batch.items():
+                try:
+                    with open(path, "a", encoding="utf-8") as f:
+                        f.writelines(lines)
+                except OSError:
+                    pass
+            for _ in range(pending):
+                q.task_done()
+
+    def _enqueue_log(self, path: Path, line: str) -> None:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Sync caller (player_action outside a loop): write inline.
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line)
+            return
+        if self._log_q is None:
+            self._log_q = asyncio.Queue()
+            self._log_task = asyncio.create_task(self._log_writer())
+        self._log_q.put_nowait((path, line))
+
+    async def flush(self) -> None:
+        """Wait until every queued history frame has reached disk."""
+        if self._log_q is not None:
+            await self._log_q.join()
+
+    def _complete_coalesced(
+        self,
+        provider: LLMProvider,
+        sem: asyncio.Semaphore,
+        *,
+        system_prompt: str,
+        user_prompt: str,
+        cacheable_prefix: str | None = None,
+    ) -> "asyncio.Future[str]":
+        """Issue a completion under the provider's semaphore, coalescing
+        byte-identical in-flight requests into a single provider call.
+
+        Keys are BLAKE2b digests of the full prompt content, so unrelated
+        prompts cannot collide the way builtin hash() could. The prefix
+        and user prompt are hashed as one concatenation, deliberately
+        without a separator: _split_history moves the stable/delta
+        boundary on every call, so two concurrent turns send the same
+        effective prompt split differently — the key must depend only on
+        what the provider sees, not on where the split fell.
+        """
+        key = hashlib.blake2b(
+            f"{system_prompt}\0{cacheable_prefix or ''}{user_prompt}".encode(),
+            digest_size=16,
+        ).digest()
+        task = self._inflight.get(key)
+        if task is None:
+
+            async def _run() -> str:
+                async with sem:
+                    return await provider.complete(
+                        system_prompt=system_prompt,
+                        user_prompt=user_prompt,
+                        cacheable_prefix=cacheable_prefix,
+                    )
+
+            task = asyncio.ensure_future(_run())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t, _k=key: self._inflight.pop(_k, None))
+        # shield: one waiter being cancelled must not kill the shared call.
+        return asyncio.shield(task)
+
+    def create_session(
+        self,
+        tccn: TCCN,
+        characters: Dict[str, Character],
+        scene: Scene | None = None,
+        history_maxlen: int = 200,
+    ) -> GameSession:
+        """Open a new session and return its public state."""
+        # 48 bits of entropy without building a UUID object just to slice
+        # its hex; retry on the astronomically rare collision.
+        session_id = secrets.token_hex(6)
+        while session_id in self._sessions:
+            session_id = secrets.token_hex(6)
+        session = GameSession(
+            id=session_id, tccn=tccn, characters=characters, scene=scene
+        )
+        # Assigned post-construction so the maxlen survives validation.
+        session.history = deque(maxlen=history_maxlen)
+        state = _GameState(session)
+        self._sessions[session_id] = state
+        # Warm the prompt cache up front: turns then pay a dict lookup
+        # instead of a first-use render.
+        self._warm_prompt_cache(state)
+        return session
+
+    def create_sessions(
+        self,
+        specs: List[tuple[TCCN, Dict[str, Character], Scene | None]],
+        history_maxlen: int = 200,
+    ) -> List[GameSession]:
+        """Open many sessions in one call.
+
+        Load tests and multi-tenant bring-up create thousands of sessions
+        back-to-back; doing it here amortizes the per-call overhead and
+        registers all states with a single dict update instead of n
+        individual inserts (so the session table resizes once, not
+        repeatedly along the way). Identical TCCNs across specs share
+        rendered prompts through the process-wide embodier cache.
+        """
+        created: List[GameSession] = []
+        new_states: dict[str, _GameState] = {}
+        for tccn, characters, scene in specs:
+            session_id = secrets.token_hex(6)
+            while session_id in self._sessions or session_id in new_states:
+                session_id = secrets.token_hex(6)
+            session = GameSession(
+                id=session_id, tccn=tccn, characters=characters, scene=scene
+            )
+            session.history = deque(maxlen=history_maxlen)
+            state = _GameState(session)
+            new_states[session_id] = state
+            created.append(session)
+        self._sessions.update(new_states)
+        for state in new_states.values():
+            self._warm_prompt_cache(state)
+        return created
+
+    def get_session(self, session_id: str) -> GameSession:
+        return self._get_state(session_id).session
+
+    def set_scene(self, session_id: str, scene: Scene | None) -> None:
+        """Move the session to a new scene, invalidating cached prompts."""
+        state = self._get_state(session_id)
+        state.session.scene = scene
+        state.prompt_cache.clear()
+        self._warm_prompt_cache(state)
+
+    def _warm_prompt_cache(self, state: _GameState) -> None:
+        """Render the GM and every NPC system prompt for the current scene."""
+        self._gm_system_prompt(state)
+        for character in state.session.characters.values():
+            self._npc_system_prompt(state, character)
+
+    def close_session(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+
+    def bulk_close(self, session_ids: List[str]) -> None:
+        """Drop many sessions at once; unknown ids are ignored."""
+        pop = self._sessions.pop
+        for session_id in session_ids:
+            pop(session_id, None)
+
+    def _get_state(self, session_id: str) -> _GameState:
+        # Single __getitem__ on the hot path; the miss branch pays for the
+        # exception only when the session genuinely does not exist.
+        try:
+            return self._sessions[session_id]
+        except KeyError:
+            raise ValueError(f"Unknown game session: {session_id}") from None
+
+    def history_json(self, session_id: str) -> bytes:
+        """The session's retained history as a JSON array, ready to send.
+
+        Concatenates per-message ``to_json`` frames at the bytes level, so
+        list endpoints never round-trip through pydantic or a Python list
+        of dicts.
+        """
+        history = self._get_state(session_id).session.history
+        return b"[" + b",".join(m.to_json() for m in history) + b"]"
+
+    def _append_history(self, state: _GameState, msg: GameMessage) -> None:
+        """Append to the bounded history, spilling the evicted head to disk."""
+        history = state.session.history
+        if (
+            history.maxlen is not None
+            and len(history) == history.maxlen
+            and self._history_log_dir is not None
+        ):
+            evicted = history[0]
+            path = self._history_log_dir / f"session_{state.session.id}.jsonl"
+            self._enqueue_log(path, evicted.model_dump_json() + "\n")
+        history.append(msg)
+
+    @staticmethod
+    def _split_history(state: _GameState) -> tuple[str, str]:
+        """Split rendered history into (stable prefix, this-turn delta).
+
+        History only grows by appending (until window eviction), which is
+        exactly the shape provider prefix caches exploit: the prefix is
+        byte-identical to what previous turns sent, the delta is new.
+        """
+        history_text = state.shared_memory.to_prompt_text()
+        boundary = min(state.cached_history_len, len(history_text))
+        state.cached_history_len = len(history_text)
+        return history_text[:boundary], history_text[boundary:]
+
+    def _gm_system_prompt(self, state: _GameState) -> str:
+        scene = state.session.scene
+        key = ("gm", None, scene.number if scene else None)
+        cached = state.prompt_cache.get(key)
+        if cached is None:
+            scene_desc = scene.prompt_description_full if scene else ""
+            cached = _render_embodier(
+                self._prompts,
+                "GAME_MASTER_EMBODIER",
+                state.session.tccn.to_prompt_text(),
+                "",
+                scene_desc,
+            )
+            state.prompt_cache[key] = cached
+        return cached
+
+    def _npc_system_prompt(self, state: _GameState, character: Character) -> str:
+        scene = state.session.scene
+        key = ("npc", character.name, scene.number if scene else None)
+        cached = state.prompt_cache.get(key)
+        if cached is None:
+            scene_desc = scene.prompt_description_short if scene else ""
+            cached = _render_embodier(
+                self._prompts,
+                "CHARACTER_EMBODIER",
+                state.session.tccn.to_prompt_text(),
+                character.to_prompt_text(),
+                scene_desc,
+            )
+            state.prompt_cache[key] = cached
+        return cached
+
+    def player_action(self, session_id: str, message: str) -> GameMessage:
+        """Record a player message; no model call is made."""
+        state = self._get_state(session_id)
+        msg = GameMessage(
+            role=_ROLE_PLAYER,
+            speaker="Player",
+            content=message,
+            timestamp=time.time_ns(),
+        )
+        self._append_history(state, msg)
+        memory = state.shared_memory
+        memory.add_message(_ROLE_PLAYER, "Player", message)
+        return msg
+
+    async def gm_action(self, session_id: str) -> GameMessage:
+        """Have the Game Master advance the story one narration."""
+        state = self._get_state(session_id)
+        memory = state.shared_memory
+        system_prompt = self._gm_system_prompt(state)
+        stable, delta = self._split_history(state)
+        raw = await self._complete_coalesced(
+            self._strong,
+            self._strong_sem,
+            system_prompt=system_prompt,
+            user_prompt="".join((delta, _GM_SUFFIX)),
+            cacheable_prefix="".join((_HISTORY_HEADER, stable)),
+        )
+        msg = GameMessage(
+            role=_ROLE_GM,
+            speaker="GM",
+            content=raw,
+            timestamp=time.time_ns(),
+        )
+        self._append_history(state, msg)
+        memory.add_message(_ROLE_GM, "GM", raw)
+        return msg
+
+    async def npc_respond(self, session_id: str, character_name: str) -> GameMessage:
+        """Have one NPC reply in voice to the conversation so far."""
+        state = self._get_state(session_id)
+        session = state.session
+        memory = state.shared_memory
+        try:
+            character = session.characters[character_name]
+        except KeyError:
+            raise ValueError(
+                f"Unknown character {character_name!r}. "
+                f"Available: {', '.join(islice(session.characters, 20))}"
+            ) from None
+        system_prompt = self._npc_system_prompt(state, character)
+        stable, delta = self._split_history(state)
+        raw = await self._complete_coalesced(
+            self._fast,
+            self._fast_sem,
+            system_prompt=system_prompt,
+            user_prompt="".join((delta, "\n\nReply in character as ", character_name, ".")),
+            cacheable_prefix="".join((_HISTORY_HEADER, stable)),
+        )
+        msg = GameMessage(
+            role=_ROLE_NPC,
+            speaker=character_name,
+            content=raw,
+            timestamp=time.time_ns(),
+        )
+        self._append_history(state, msg)
+        memory.add_message(_ROLE_NPC, character_name, raw)
+        return msg
+
+    @staticmethod
+    async def _buffered_chunks(
+        stream: AsyncIterator[str],
+        parts: List[str],
+        flush_chars: int = 256,
+        flush_secs: float = 0.2,
+    ) -> AsyncIterator[str]:
+        """Re-chunk a token stream into larger groups for the consumer.
+
+        Per-token yields thrash the transport; groups are flushed once
+        they reach ``flush_chars`` or when ``flush_secs`` has passed, so
+        slow generations still arrive promptly. Every chunk is also
+        collected into ``parts`` for the caller's final message.
+        """
+        buf: List[str] = []
+        buf_len = 0
+        last_flush = time.monotonic()
+        async for chunk in stream:
+            parts.append(chunk)
+            buf.append(chunk)
+            buf_len += len(chunk)
+            now = time.monotonic()
+            if buf_len >= flush_chars or (now - last_flush) >= flush_secs:
+                yield "".join(buf)
+                buf.clear()
+                buf_len = 0
+                last_flush = now
+        if buf:
+            yield "".join(buf)
+
+    async def gm_action_stream(self, session_id: str) -> AsyncIterator[str]:
+        """Streaming variant of :meth:`gm_action`.
+
+        Yields narration chunks as they arrive; the full GameMessage is
+        appended to history/shared memory once the stream completes.
+        """
+        state = self._get_state(session_id)
+        memory = state.shared_memory
+        system_prompt = self._gm_system_prompt(state)
+        stable, delta = self._split_history(state)
+        parts: List[str] = []
+        stream = self._strong.stream(
+            system_prompt=system_prompt,
+            user_prompt="".join((delta, _GM_SUFFIX)),
+            cacheable_prefix="".join((_HISTORY_HEADER, stable)),
+        )
+        async for group in self._buffered_chunks(stream, parts):
+            yield group
+        content = "".join(parts)
+        msg = GameMessage(
+            role=_ROLE_GM,
+            speaker="GM",
+            content=content,
+            timestamp=time.time_ns(),
+        )
+        self._append_history(state, msg)
+        memory.add_message(_ROLE_GM, "GM", content)
+
+    async def npc_respond_stream(
+        self, session_id: str, character_name: str
+    ) -> AsyncIterator[str]:
+        """Streaming variant of :meth:`npc_respond`."""
+        state = self._get_state(session_id)
+        session = state.session
+        memory = state.shared_memory
+        try:
+            character = session.characters[character_name]
+        except KeyError:
+            raise ValueError(
+                f"Unknown character {character_name!r}. "
+                f"Available: {', '.join(islice(session.characters, 20))}"
+            ) from None
+        system_prompt = self._npc_system_prompt(state, character)
+        stable, delta = self._split_history(state)
+        parts: List[str] = []
+        stream = self._fast.stream(
+            system_prompt=system_prompt,
+            user_prompt="".join((delta, "\n\nReply in character as ", character_name, ".")),
+            cacheable_prefix="".join((_HISTORY_HEADER, stable)),
+        )
+        async for group in self._buffered_chunks(stream, parts):
+            yield group
+        content = "".join(parts)
+        msg = GameMessage(
+            role=_ROLE_NPC,
+            speaker=character_name,
+            content=content,
+            timestamp=time.time_ns(),
+        )
+        self._append_history(state, msg)
+        memory.add_message(_ROLE_NPC, character_name, content)
+
+    async def npc_respond_many(
+        self, session_id: str, character_names: List[str]
+    ) -> List[GameMessage]:
+        """Have several NPCs reply concurrently to the same conversation.
+
+        All completions are fired together (bounded by the service
+        semaphore) against the history as it stood when the call was
+        made; replies are then appended to history and shared memory in
+        the order the characters were named, so memory stays
+        deterministic.
+        """
+        state = self._get_state(session_id)
+        session = state.session
+        memory = state.shared_memory
+        characters = []
+        for name in character_names:
+            try:
+                characters.append(session.characters[name])
+            except KeyError:
+                raise ValueError(
+                    f"Unknown character {name!r}. "
+                    f"Available: {', '.join(islice(session.characters, 20))}"
+                ) from None
+
+        stable, delta = self._split_history(state)
+        cacheable_prefix = "".join((_HISTORY_HEADER, stable))
+        prompts = [
+            (
+                self._npc_system_prompt(state, character),
+                "".join((delta, "\n\nReply in character as ", character.name, ".")),
+            )
+            for character in characters
+        ]
+
+        responses = await asyncio.gather(
+            *(
+                self._complete_coalesced(
+                    self._fast,
+                    self._fast_sem,
+                    system_prompt=sp,
+                    user_prompt=up,
+                    cacheable_prefix=cacheable_prefix,
+                )
+                for sp, up in prompts
+            )
+        )
+
+        messages: List[GameMessage] = []
+        for character, raw in zip(characters, responses):
+            msg = GameMessage(
+                role=_ROLE_NPC,
+                speaker=character.name,
+                content=raw,
+                timestamp=time.time_ns(),
+            )
+            self._append_history(state, msg)
+            memory.add_message(_ROLE_NPC, character.name, raw)
+            messages.append(msg)
+        return messages
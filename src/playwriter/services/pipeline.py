@@ -0,0 +1,605 @@
+"""The pipeline: end-to-end play generation and the beat-level micro loop.
+
+``PipelineService`` drives two flows. ``full_pipeline`` is the static
+path: cast generation and refinement, scene outline, places, and prose,
+straight from a TCCN seed. ``advance``/``resolve_beat`` is the live path:
+it leans on the ``NarrativeEngine`` for the macro loop (acts, scenes,
+world events) and resolves the individual beats itself — action against
+dice, outcome against prose, prose against character-state deltas.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+from itertools import islice
+from typing import Dict, List
+
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+
+from ..engine.models import Beat, EngineScene, NarrativeWorld
+from ..engine.narrative import NarrativeEngine, _safe_json_loads
+from ..llm import BatchingLLMProvider, CachedLLMProvider, LLMProvider
+from ..models import TCCN, Character, CharacterSummary, Place, Scene, TropeSample
+from ..output_parser import OutputParser
+from ..prompts import PromptLoader
+from .character import CharacterService
+from .dice import DiceRoll, DiceService
+from .scene import SceneService
+
+
+class BeatActionItem(BaseModel):
+    """One proposed beat action: who tries what next."""
+
+    actor: str = ""
+    action: str
+
+
+class CharacterDelta(BaseModel):
+    """One character-state change extracted from a resolved beat."""
+
+    character: str
+    field: str = ""
+    change: str = ""
+
+
+# One pydantic-core pass validates a whole list of items in C; the loose
+# per-field .get() extraction survives only as the fallback for payloads
+# the adapters reject.
+_ACTION_LIST_ADAPTER = TypeAdapter(List[BeatActionItem])
+_DELTA_LIST_ADAPTER = TypeAdapter(List[CharacterDelta])
+
+
+def _parse_action_items(data: object) -> List[BeatActionItem]:
+    items = data.get("actions", []) if isinstance(data, dict) else []
+    try:
+        actions = _ACTION_LIST_ADAPTER.validate_python(items)
+    except ValidationError:
+        actions = [
+            BeatActionItem(
+                actor=str(item.get("actor", "")), action=str(item.get("action", ""))
+            )
+            for item in items
+            if isinstance(item, dict)
+        ]
+    return [a for a in actions if a.action]
+
+
+def _parse_deltas(data: object) -> List[CharacterDelta]:
+    items = data.get("deltas", []) if isinstance(data, dict) else []
+    try:
+        deltas = _DELTA_LIST_ADAPTER.validate_python(items)
+    except ValidationError:
+        deltas = [
+            CharacterDelta(
+                character=str(item.get("character", "")),
+                field=str(item.get("field", "")),
+                change=str(item.get("change", "")),
+            )
+            for item in items
+            if isinstance(item, dict)
+        ]
+    return [d for d in deltas if d.character]
+
+
+class PipelineResult(BaseModel):
+    """Everything the static pipeline produced for one TCCN seed."""
+
+    characters: List[Character] = Field(default_factory=list)
+    scenes: List[Scene] = Field(default_factory=list)
+    places: List[Place] = Field(default_factory=list)
+    critique: str = ""
+    prose: List[str] = Field(default_factory=list)
+
+
+class PipelineService:
+    """Runs plays end to end: static generation and live beat resolution."""
+
+    def __init__(
+        self,
+        strong_llm: LLMProvider,
+        fast_llm: LLMProvider | None = None,
+        characters: CharacterService | None = None,
+        scenes: SceneService | None = None,
+        dice: DiceService | None = None,
+        engine: NarrativeEngine | None = None,
+        prompts: PromptLoader | None = None,
+        max_concurrency: int = 5,
+        cache_responses: bool = False,
+    ) -> None:
+        # ``cache_responses`` wraps both tiers in the in-process LRU so
+        # retries, director re-runs and replayed scenes that re-issue
+        # byte-identical prompts skip the network. Only sound when the
+        # providers are deterministic (temperature 0 or pinned seed).
+        self._response_caches: List[CachedLLMProvider] = []
+        if cache_responses:
+            strong_llm = CachedLLMProvider(strong_llm, cache_all=True)
+            self._response_caches.append(strong_llm)
+            if fast_llm is not None:
+                fast_llm = CachedLLMProvider(fast_llm, cache_all=True)
+                self._response_caches.append(fast_llm)
+        self._strong = strong_llm
+        self._fast = fast_llm or strong_llm
+        self._prompts = prompts or PromptLoader(
+            constants={
+                "format_instructions_character": OutputParser.format_instructions(Character)
+            }
+        )
+        self._characters = characters or CharacterService(strong_llm, self._prompts)
+        self._scenes = scenes or SceneService(strong_llm, self._prompts)
+        self._dice = dice or DiceService(self._fast, self._prompts)
+        self._engine = engine or NarrativeEngine(
+            strong_llm,
+            fast_llm=self._fast,
+            characters=self._characters,
+            prompts=self._prompts,
+        )
+        # Bound on concurrent generation calls, so a wide cast fan-out
+        # stays inside provider rate limits.
+        self._gen_sem = asyncio.Semaphore(max_concurrency)
+        # Deltas accumulated per scene by resolve_beat, consumed when the
+        # scene completes and the engine folds them into the dossiers.
+        self._pending_deltas: Dict[str, Dict[str, List[dict]]] = {}
+
+    @property
+    def engine(self) -> NarrativeEngine:
+        return self._engine
+
+    # ------------------------------------------------------------------
+    # Static pipeline
+    # ------------------------------------------------------------------
+
+    async def full_pipeline(
+        self,
+        tccn: TCCN,
+        trope_sample: TropeSample | None = None,
+        batch_mode: bool = False,
+    ) -> PipelineResult:
+        """Generate the whole play from its seed: cast, outline, prose.
+
+        Character generation and refinement are independent across the
+        cast, so each stage fans out with ``asyncio.gather`` under the
+        concurrency bound: 2N serial round-trips become two round-trips
+        of latency. ``gather`` preserves input order, so the refined cast
+        lines up with ``tccn.characters`` and feeds scene writing as-is.
+
+        ``batch_mode`` is for offline runs with no latency target: the
+        per-character calls route through a ``BatchingLLMProvider`` with
+        the interactive semaphore lifted, so each stage lands in one
+        collected dispatch. Adapters backed by a true provider batch
+        endpoint (half-price, minutes-to-hours turnaround) submit that
+        dispatch as a single job by overriding ``_complete_batch``.
+        """
+        if batch_mode:
+            characters = CharacterService(
+                BatchingLLMProvider(self._strong, batch_window_ms=50.0, max_batch=64),
+                self._prompts,
+            )
+            sem = contextlib.nullcontext()
+        else:
+            characters = self._characters
+            sem = self._gen_sem
+
+        async def _generate(cs: CharacterSummary) -> Character:
+            async with sem:
+                return await characters.generate(tccn, cs)
+
+        async def _refine(character: Character) -> Character:
+            async with sem:
+                return await characters.refine(tccn, character)
+
+        generated = await asyncio.gather(*(_generate(cs) for cs in tccn.characters))
+        refined = list(await asyncio.gather(*(_refine(c) for c in generated)))
+
+        scenes = await self._scenes.compose_scenes(tccn, trope_sample)
+        critique = await self._scenes.evaluate_scenes(tccn, scenes)
+        places = await self._scenes.design_places(tccn, scenes)
+        cast_text = "\n\n".join(c.to_prompt_text() for c in refined)
+        prose = [
+            await self._scenes.write_scene(
+                tccn, scene, refined, characters_text=cast_text
+            )
+            for scene in scenes
+        ]
+        return PipelineResult(
+            characters=refined,
+            scenes=scenes,
+            places=places,
+            critique=critique,
+            prose=prose,
+        )
+
+    # ------------------------------------------------------------------
+    # Live loop
+    # ------------------------------------------------------------------
+
+    async def advance(
+        self,
+        world_id: str,
+        beats_per_scene: int = 6,
+        prefetch_scenes: int = 0,
+    ) -> EngineScene:
+        """Play one scene forward: compose, resolve its beats, fold back.
+
+        With ``prefetch_scenes > 0``, the next scene's composition and
+        beat planning start as a background task before this scene's
+        beats resolve, so by the time the next ``advance`` call arrives
+        the strong-LLM work is already in flight (or done). The prefetch
+        prompts see thread/character state as of this scene's start — a
+        deliberate trade of one scene of staleness for a full
+        compose-plus-plan round-trip off the critical path.
+        """
+        world = self._engine.get_world(world_id)
+        if not world.acts or world.acts[-1].status == "complete":
+            await self._engine.plan_act(world_id)
+        act = world.acts[-1]
+        future = act.next_scene_future
+        act.set_next_scene_future(None)
+        if future is not None:
+            scene, actions = await future
+        else:
+            scene, actions = await self._compose_and_plan(world_id)
+        # Play reaches this scene now; prefetched scenes composed below
+        # must not repoint the world until their own advance call.
+        world.scene_started(scene)
+        if prefetch_scenes > 0:
+            act.set_next_scene_future(
+                asyncio.create_task(self._compose_and_plan(world_id))
+            )
+        prose_parts: List[str] = []
+        beats: List[Beat] = []
+        for item in actions[:beats_per_scene]:
+            # Deltas for the whole scene ride one batched call below
+            # instead of one fast-LLM round-trip per beat.
+            beat = await self.resolve_beat(
+                world_id, scene.id, item.actor, item.action, calc_deltas=False
+            )
+            prose_parts.append(beat.prose)
+            beats.append(beat)
+        if beats:
+            deltas = await self._calculate_beat_deltas_batch(
+                self._scene_prefix(scene), self._scene_context(scene), beats
+            )
+            if deltas:
+                self._apply_deltas(world, scene.id, deltas)
+        self._engine.complete_scene(world_id, scene.id, "\n\n".join(prose_parts))
+        await self._engine.advance_thread_states(world_id, scene.id)
+        deltas_by_char = self._pending_deltas.pop(scene.id, {})
+        if deltas_by_char:
+            await self._engine.update_characters_after_scene(
+                world_id, scene.id, deltas_by_char
+            )
+        return scene
+
+    async def _compose_and_plan(
+        self, world_id: str
+    ) -> tuple[EngineScene, List[BeatActionItem]]:
+        """Compose the next scene and propose its beats in one step."""
+        scene = await self._engine.compose_next_scene(world_id)
+        actions = await self.generate_beat_actions(world_id, scene.id)
+        return scene, actions
+
+    async def generate_beat_actions(
+        self, world_id: str, scene_id: str, n_actions: int = 6
+    ) -> List[BeatActionItem]:
+        """Propose the next beats of a scene from its cast and plan."""
+        world = self._engine.get_world(world_id)
+        scene = self._require_scene(world, scene_id)
+        scene_prefix = self._scene_prefix(scene)
+        actor_profiles = "\n\n".join(self._actor_profiles(world, scene).values())
+        user_prompt = self._prompts.render(
+            "engine",
+            "BEAT_ACTION_GENERATOR",
+            scene_context=self._scene_context(scene),
+            actor_profiles=actor_profiles or "(no known actors)",
+            planned_actions="\n".join(f"- {p}" for p in scene.planned_actions)
+            or "(no planned actions)",
+            n_actions=str(n_actions),
+        )
+        raw = await self._strong.complete(
+            system_prompt="You are a master playwright breaking a scene into beats.",
+            user_prompt=user_prompt,
+            json_mode=True,
+            max_tokens=1024,
+            cacheable_prefix=scene_prefix,
+        )
+        return _parse_action_items(_safe_json_loads(raw))
+
+    async def resolve_beat(
+        self,
+        world_id: str,
+        scene_id: str,
+        actor: str,
+        action: str,
+        calc_deltas: bool = True,
+    ) -> Beat:
+        """Resolve one beat: dice, actual outcome, prose, state deltas.
+
+        ``advance`` passes ``calc_deltas=False`` and batches the delta
+        extraction for the whole scene in one call afterwards.
+        """
+        world = self._engine.get_world(world_id)
+        scene = self._require_scene(world, scene_id)
+        scene_prefix = self._scene_prefix(scene)
+        scene_context = self._scene_context(scene)
+
+        # 1. The dice decide how the attempt lands.
+        dice_roll = await self._dice.resolve_action(
+            actor, action, world.global_trope_pool, scene_prefix + scene_context
+        )
+
+        # 2. Narrate what actually happened, honoring the roll.
+        profiles = self._actor_profiles(world, scene)
+        actor_profile = profiles.get(actor) or f"Name: {actor}"
+        # Two bystander profiles are plenty of context for the resolver;
+        # islice stops the join without materializing the filtered rest.
+        others_iter = (text for name, text in profiles.items() if name != actor)
+        others_text = "\n\n".join(islice(others_iter, 2))
+        fate_text = dice_roll.fate_text
+        outcome_prompt = self._prompts.render(
+            "engine",
+            "BEAT_RESOLVER",
+            scene_context=scene_context,
+            actor_profile=actor_profile,
+            others_text=others_text or "(no one else present)",
+            action=action,
+            dice_outcome=dice_roll.outcome.value,
+            dice_detail=(
+                f"{dice_roll.raw_roll} {dice_roll.total_modifier:+d} "
+                f"-> {dice_roll.final_value}"
+            ),
+            fate_text=fate_text,
+        )
+        # The outcome is consumed as a stream: once enough of it has
+        # arrived to know how the attempt landed (a sentence boundary
+        # past 200 chars), the prose call launches against that head, so
+        # its prefill overlaps the resolver's remaining decode. Any tail
+        # still streaming in only elaborates the outcome; the full text
+        # is what lands on the Beat and feeds the deltas.
+        outcome_buf = ""
+        prose_task: asyncio.Task[str] | None = None
+        stream = self._strong.stream(
+            system_prompt=(
+                "You narrate what ACTUALLY happened when a character attempted "
+                "an action, honoring the dice outcome exactly."
+            ),
+            user_prompt=outcome_prompt,
+            max_tokens=512,
+            cacheable_prefix=scene_prefix,
+        )
+        async for chunk in stream:
+            outcome_buf += chunk
+            if prose_task is None and len(outcome_buf) >= 200:
+                head = outcome_buf.rstrip()
+                if head.endswith((".", "!", "?", '."', '!"', '?"')):
+                    prose_task = asyncio.create_task(
+                        self._write_beat_prose(
+                            scene_prefix, scene_context, actor_profile, action, head
+                        )
+                    )
+        actual_outcome = outcome_buf.strip()
+
+        # Prose and deltas both depend only on the outcome, not on each
+        # other, and ride different models — overlap them so the beat
+        # pays max(strong, fast) latency instead of the sum. Delta
+        # failures are already absorbed inside the helper.
+        if prose_task is None:
+            prose_task = asyncio.create_task(
+                self._write_beat_prose(
+                    scene_prefix, scene_context, actor_profile, action, actual_outcome
+                )
+            )
+        if calc_deltas:
+            delta_task = asyncio.create_task(
+                self._calculate_beat_deltas(
+                    scene_prefix, scene_context, actor_profile, action, actual_outcome, dice_roll
+                )
+            )
+            prose, deltas = await asyncio.gather(prose_task, delta_task)
+        else:
+            prose, deltas = await prose_task, []
+        if deltas:
+            self._apply_deltas(world, scene.id, deltas)
+
+        beat = Beat(
+            id=scene.next_beat_id(),
+            actor=actor,
+            action=action,
+            actual_outcome=actual_outcome,
+            prose=prose.strip(),
+            dice_roll=dice_roll,
+        )
+        world.record_beat(beat, scene)
+        return beat
+
+    async def _write_beat_prose(
+        self,
+        scene_prefix: str,
+        scene_context: str,
+        actor_profile: str,
+        action: str,
+        actual_outcome: str,
+    ) -> str:
+        """Write one resolved beat out as theatrical prose."""
+        prose_prompt = self._prompts.render(
+            "engine",
+            "BEAT_PROSE_WRITER",
+            scene_context=scene_context,
+            actor_profile=actor_profile,
+            action=action,
+            actual_outcome=actual_outcome,
+        )
+        return await self._strong.complete(
+            system_prompt="You are a master playwright writing one beat as prose.",
+            user_prompt=prose_prompt,
+            max_tokens=1024,
+            cacheable_prefix=scene_prefix,
+        )
+
+    async def _calculate_beat_deltas(
+        self,
+        scene_prefix: str,
+        scene_context: str,
+        actor_profile: str,
+        action: str,
+        actual_outcome: str,
+        dice_roll: DiceRoll,
+    ) -> List[CharacterDelta]:
+        """Ask the fast model what state changed; empty list on bad output."""
+        user_prompt = self._prompts.render(
+            "engine",
+            "BEAT_DELTA_CALCULATOR",
+            scene_context=scene_context,
+            actor_profile=actor_profile,
+            action=action,
+            actual_outcome=actual_outcome,
+            dice_outcome=dice_roll.outcome.value,
+        )
+        try:
+            raw = await self._fast.complete(
+                system_prompt="You extract character state changes as terse JSON deltas.",
+                user_prompt=user_prompt,
+                json_mode=True,
+                max_tokens=512,
+                cacheable_prefix=scene_prefix,
+            )
+            return _parse_deltas(_safe_json_loads(raw))
+        except (ValueError, json.JSONDecodeError):
+            return []
+
+    async def _calculate_beat_deltas_batch(
+        self, scene_prefix: str, scene_context: str, beats: List[Beat]
+    ) -> List[CharacterDelta]:
+        """Extract deltas for a whole scene's beats in one fast-LLM call."""
+        blocks = [
+            f"BEAT {i + 1}: {beat.actor} attempted: {beat.action}\n"
+            f"Dice: {beat.dice_roll.outcome.value if beat.dice_roll else 'unrolled'}\n"
+            f"Outcome: {beat.actual_outcome}"
+            for i, beat in enumerate(beats)
+        ]
+        user_prompt = self._prompts.render(
+            "engine",
+            "BEAT_DELTA_CALCULATOR_BATCH",
+            scene_context=scene_context,
+            beats_text="\n\n".join(blocks),
+        )
+        try:
+            raw = await self._fast.complete(
+                system_prompt="You extract character state changes as terse JSON deltas.",
+                user_prompt=user_prompt,
+                json_mode=True,
+                max_tokens=1024,
+                cacheable_prefix=scene_prefix,
+            )
+            return _parse_deltas(_safe_json_loads(raw))
+        except (ValueError, json.JSONDecodeError):
+            return []
+
+    def _apply_deltas(
+        self, world: NarrativeWorld, scene_id: str, deltas: List[CharacterDelta]
+    ) -> None:
+        """Fold deltas into the dossiers and queue them for the engine."""
+        per_scene = self._pending_deltas.setdefault(scene_id, {})
+        scene = world.find_scene(scene_id)
+        chars = world.characters
+        for delta in deltas:
+            per_scene.setdefault(delta.character, []).append(delta.model_dump())
+            if (character := chars.get(delta.character)) is not None:
+                character.apply_delta(delta.field, delta.change)
+                if scene is not None:
+                    # Only the mutated actor's staged render goes stale.
+                    scene.actor_profile_cache.pop(delta.character, None)
+        world.bump_chars_rev()
+
+    @staticmethod
+    def _actor_profiles(world: NarrativeWorld, scene: EngineScene) -> Dict[str, str]:
+        """Rendered dossiers of the scene's cast, staged on the scene.
+
+        Filled lazily in cast order; between deltas every beat of the
+        scene reads the same dict instead of re-rendering per call.
+        """
+        cache = scene.actor_profile_cache
+        chars = world.characters
+        for name in scene.actors:
+            if name not in cache and (character := chars.get(name)) is not None:
+                cache[name] = character.to_prompt_text()
+        return cache
+
+    # ------------------------------------------------------------------
+    # Read-only views
+    # ------------------------------------------------------------------
+
+    def get_dice_history(self, world_id: str) -> List[dict]:
+        """Every resolved roll of the world, flattened for display."""
+        world = self._engine.get_world(world_id)
+        # One comprehension instead of nested loops with per-beat appends;
+        # the modifier dicts are serialized once per roll and shared
+        # across repeated exports.
+        return [
+            {
+                "actor": beat.actor,
+                "action": beat.action,
+                "raw_roll": roll.raw_roll,
+                "final_value": roll.final_value,
+                "outcome": roll.outcome.value,
+                "total_modifier": roll.total_modifier,
+                "fate_modifiers": roll.fate_dicts,
+            }
+            for act in world.acts
+            for scene in act.scenes
+            for beat in scene.beats
+            if (roll := beat.dice_roll) is not None
+        ]
+
+    def get_accumulated_prose(self, world_id: str) -> str:
+        """The full prose of the world so far."""
+        return self._engine.get_world(world_id).accumulated_prose
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Aggregated response-cache counters across the wrapped tiers.
+
+        All zeros unless the service was built with ``cache_responses``.
+        """
+        totals = {"hits": 0, "misses": 0, "size": 0}
+        for cache in self._response_caches:
+            for key, value in cache.cache_stats().items():
+                totals[key] += value
+        return totals
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _require_scene(world: NarrativeWorld, scene_id: str) -> EngineScene:
+        scene = world.find_scene(scene_id)
+        if scene is None:
+            raise ValueError(f"Unknown scene: {scene_id}")
+        return scene
+
+    @staticmethod
+    def _scene_prefix(scene: EngineScene) -> str:
+        """The byte-stable head shared by every beat prompt of a scene.
+
+        Setting, place and cast never change once a scene is composed, so
+        they ride as ``cacheable_prefix`` and provider prompt caches serve
+        them on every beat after the first.
+        """
+        return (
+            f"Setting: {scene.setting}\n"
+            f"Place: {scene.place}\n"
+            f"Actors: {', '.join(scene.actors)}\n"
+        )
+
+    @staticmethod
+    def _scene_context(scene: EngineScene) -> str:
+        """Render the mutable situation block for beat prompts.
+
+        New lines only ever append, so between beats the block grows at
+        its tail and the longest-common-prefix the provider cache matches
+        against never breaks mid-scene. The tail itself is maintained
+        incrementally on the scene as beats are recorded.
+        """
+        tail = scene.recent_events_text
+        return f"Recent events:\n{tail}" if tail else 'Recent events:'
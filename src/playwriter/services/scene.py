@@ -0,0 +1,456 @@
+"""Scene composition, evaluation, prose writing and place design.
+
+``SceneService`` is the static-generation path: given a TCCN seed it drafts
+a scene outline, critiques it, designs the places it needs, and writes each
+scene out as theatrical prose. The outline comes back from the LLM as
+sectioned text (``SCENE NUMBER (N):`` blocks) rather than JSON — long
+structured-prose replies survive that format far better — and is parsed
+back into ``Scene`` models here.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+from functools import lru_cache
+from typing import AsyncIterator, List, Optional, Tuple
+
+from ..llm import ChainStep, LLMProvider
+from ..models import TCCN, Character, Place, Scene, SceneAction, TropeSample
+from ..prompts import PromptLoader
+
+# Parsing patterns, compiled once at import.
+_SCENE_SPLIT_RE = re.compile(r"SCENE\s+NUMBER\s*\(?(\d+)\)?:", re.IGNORECASE)
+_ACTION_VERBS = frozenset(
+    ("does", "talks", "says", "goes", "walks", "enters", "exits", "looks")
+)
+_ACTOR_VERB_RE = re.compile(
+    r"(.+?)\s+(?:does|talks|says|goes|walks|enters|exits|looks)\s+(.+)",
+    re.IGNORECASE,
+)
+
+# Section headers of a scene block, mapped to their bucket. The block
+# parser recognizes these by prefix check on the upcased line; any other
+# ALL-CAPS header closes the section it interrupts.
+_SECTION_PREFIXES = (
+    ("SETTING:", "setting"),
+    ("ACTORS:", "actors"),
+    ("NARRATIVE THREADS:", "threads"),
+    ("LIST OF ACTIONS", "actions"),
+)
+
+
+class SceneService:
+    """Composes, evaluates and writes the scenes of a play."""
+
+    def __init__(self, llm: LLMProvider, prompts: PromptLoader | None = None) -> None:
+        self._strong = llm
+        self._prompts = prompts or PromptLoader()
+
+    async def compose_scenes(
+        self, tccn: TCCN, trope_sample: TropeSample | None = None
+    ) -> List[Scene]:
+        """Draft the scene outline of the play from its TCCN seed.
+
+        The trope draw is the only part that varies between retries of
+        the same seed, so it goes at the tail: everything before it —
+        system prompt, seed, format instructions — is byte-stable and
+        rides the provider's prefix cache.
+        """
+        user_prompt = self._prompts.render("generators", "INITIAL_SCENE_TCC_GENERATOR")
+        if trope_sample is not None:
+            user_prompt += (
+                "\n\nSCENE TROPES (literary fate bends these scenes):\n"
+                f"{trope_sample.to_prompt_text()}"
+            )
+        raw = await self._strong.complete(
+            system_prompt="You are a master scene architect planning the scenes of a play.",
+            user_prompt=user_prompt,
+            max_tokens=3072,
+            cacheable_prefix=self._tcc_prefix(tccn),
+        )
+        return self._parse_scenes(raw)
+
+    async def compose_scenes_batch(
+        self,
+        items: List[Tuple[TCCN, TropeSample | None]],
+        max_concurrency: int = 8,
+    ) -> List[List[Scene]]:
+        """Compose outlines for several seeds concurrently.
+
+        Sweeps (multiple premises, multiple trope draws of one premise)
+        were looping over ``compose_scenes`` one await at a time, which
+        hides all the parallelism a batching backend could exploit. All
+        calls are issued under one gather, with a semaphore keeping the
+        in-flight count polite.
+        """
+        sem = asyncio.Semaphore(max_concurrency)
+
+        async def _one(tccn: TCCN, trope_sample: TropeSample | None) -> List[Scene]:
+            async with sem:
+                return await self.compose_scenes(tccn, trope_sample)
+
+        return await asyncio.gather(*(_one(t, ts) for t, ts in items))
+
+    async def write_scenes_batch(
+        self,
+        tccn: TCCN,
+        scenes: List[Scene],
+        characters: List[Character],
+        max_concurrency: int = 8,
+    ) -> List[str]:
+        """Write every scene of one outline concurrently, in order."""
+        sem = asyncio.Semaphore(max_concurrency)
+        characters_text = self._characters_text(characters)
+
+        async def _one(scene: Scene) -> str:
+            async with sem:
+                return await self.write_scene(
+                    tccn, scene, characters, characters_text=characters_text
+                )
+
+        return await asyncio.gather(*(_one(s) for s in scenes))
+
+    async def compose_evaluate_write(
+        self,
+        tccn: TCCN,
+        characters: List[Character],
+        trope_sample: TropeSample | None = None,
+    ) -> Tuple[List[Scene], str, List[str]]:
+        """Run the full compose -> evaluate -> write chain for one play.
+
+        Compose and evaluate are issued as one ``complete_chain``: the
+        evaluator's prompt takes the raw outline reply via ``{prev}``,
+        so a chain-capable provider pipes it server-side instead of
+        round-tripping through the client. The scenes are then written
+        concurrently from the parsed outline. Returns ``(scenes,
+        critique, prose)`` with prose in scene order.
+        """
+        compose_prompt = self._prompts.render(
+            "generators", "INITIAL_SCENE_TCC_GENERATOR"
+        )
+        if trope_sample is not None:
+            compose_prompt += (
+                "\n\nSCENE TROPES (literary fate bends these scenes):\n"
+                f"{trope_sample.to_prompt_text()}"
+            )
+        prefix = self._tcc_prefix(tccn)
+        raw_outline, critique = await self._strong.complete_chain(
+            [
+                ChainStep(
+                    system_prompt="You are a master scene architect planning the scenes of a play.",
+                    user_prompt=compose_prompt,
+                    max_tokens=3072,
+                    cacheable_prefix=prefix,
+                ),
+                ChainStep(
+                    system_prompt="You are a ruthless dramaturg evaluating a scene outline.",
+                    user_prompt=self._prompts.render(
+                        "generators", "SCENE_EVALUATOR", scenes_text="{prev}"
+                    ),
+                    max_tokens=1024,
+                    cacheable_prefix=prefix,
+                ),
+            ]
+        )
+        scenes = self._parse_scenes(raw_outline)
+        prose = await self.write_scenes_batch(tccn, scenes, characters)
+        return scenes, critique.strip(), prose
+
+    async def evaluate_scenes(self, tccn: TCCN, scenes: List[Scene]) -> str:
+        """Critique a scene outline against its TCCN; returns the critique."""
+        user_prompt = self._prompts.render(
+            "generators",
+            "SCENE_EVALUATOR",
+            scenes_text=self._scenes_to_text(tccn, scenes),
+        )
+        raw = await self._strong.complete(
+            system_prompt="You are a ruthless dramaturg evaluating a scene outline.",
+            user_prompt=user_prompt,
+            max_tokens=1024,
+            cacheable_prefix=self._tcc_prefix(tccn),
+        )
+        return raw.strip()
+
+    async def write_scene(
+        self,
+        tccn: TCCN,
+        scene: Scene,
+        characters: List[Character],
+        characters_text: str | None = None,
+    ) -> str:
+        """Write one scene of the outline out as theatrical prose.
+
+        The cast block is the same for every scene of a play; callers
+        writing several scenes pass the pre-rendered ``characters_text``
+        so the join is paid once per play, not once per scene.
+        """
+        if characters_text is None:
+            characters_text = self._characters_text(characters)
+        user_prompt = self._prompts.render(
+            "generators",
+            "SCENE_WRITER",
+            scene_text=self._scene_to_text(scene),
+            characters=characters_text,
+        )
+        raw = await self._strong.complete(
+            system_prompt="You are a master playwright writing a scene in full.",
+            user_prompt=user_prompt,
+            max_tokens=4096,
+            cacheable_prefix=self._tcc_prefix(tccn),
+        )
+        return raw.strip()
+
+    async def write_scene_stream(
+        self,
+        tccn: TCCN,
+        scene: Scene,
+        characters: List[Character],
+        characters_text: str | None = None,
+    ) -> AsyncIterator[str]:
+        """Stream one scene's prose as it is generated.
+
+        Same prompt as ``write_scene``, but yielded chunk by chunk via
+        the provider's streaming interface: a 4K-token scene otherwise
+        shows nothing until the last token lands, while a UI or disk
+        writer consuming this overlaps with generation and sees first
+        text within the provider's time-to-first-token. Providers
+        without native streaming degrade to one chunk holding the full
+        reply.
+        """
+        if characters_text is None:
+            characters_text = self._characters_text(characters)
+        user_prompt = self._prompts.render(
+            "generators",
+            "SCENE_WRITER",
+            scene_text=self._scene_to_text(scene),
+            characters=characters_text,
+        )
+        async for chunk in self._strong.stream(
+            system_prompt="You are a master playwright writing a scene in full.",
+            user_prompt=user_prompt,
+            max_tokens=4096,
+            cacheable_prefix=self._tcc_prefix(tccn),
+        ):
+            yield chunk
+
+    async def design_places(self, tccn: TCCN, scenes: List[Scene]) -> List[Place]:
+        """Design the concrete places the outlined scenes are staged in."""
+        settings = "\n".join(f"- {s.setting}" for s in scenes if s.setting)
+        user_prompt = self._prompts.render(
+            "generators",
+            "PLACE_DESIGNER",
+            settings=settings or "(no settings named)",
+        )
+        raw = await self._strong.complete(
+            system_prompt="You are a scenographer designing the places of a play.",
+            user_prompt=user_prompt,
+            max_tokens=2048,
+            cacheable_prefix=self._tcc_prefix(tccn),
+        )
+        # One pass over the reply: paragraph bounds come from str.find
+        # rather than split, so each block is sliced exactly once instead
+        # of split -> strip -> re-split walking the text three times.
+        places: List[Place] = []
+        i, n = 0, len(raw)
+        while i < n:
+            j = raw.find("\n\n", i)
+            if j < 0:
+                j = n
+            block = raw[i:j].strip()
+            i = j + 2
+            nl = block.find("\n")
+            if nl <= 0:
+                continue
+            name = block[:nl].strip().rstrip(":")
+            description = block[nl + 1 :].replace("\n", " ").strip()
+            if name and description:
+                places.append(Place(name=name, description=description))
+        return places
+
+    # ------------------------------------------------------------------
+    # Outline text parsing
+    # ------------------------------------------------------------------
+
+    def _parse_scenes(self, raw: str) -> List[Scene]:
+        """Parse the sectioned outline reply back into ``Scene`` models."""
+        parts = self._split_scene_blocks(raw)
+        scenes: List[Scene] = []
+        # parts alternates [preamble, number, body, number, body, ...].
+        for i in range(1, len(parts) - 1, 2):
+            sections = self._parse_scene_block(parts[i + 1])
+            actors_raw = " ".join(sections["actors"])
+            threads_raw = " ".join(sections["threads"])
+            scenes.append(
+                Scene(
+                    number=int(parts[i]),
+                    setting=" ".join(sections["setting"]),
+                    actors=[a.strip() for a in actors_raw.split(",") if a.strip()],
+                    narrative_threads=[
+                        t.strip() for t in threads_raw.split(",") if t.strip()
+                    ],
+                    actions=self._extract_actions(sections["actions"]),
+                )
+            )
+        return scenes
+
+    @staticmethod
+    def _split_scene_blocks(raw: str) -> List[str]:
+        """Split a reply on its scene headers.
+
+        Well-formed replies use the literal ``SCENE NUMBER (N):`` header
+        the template demands, so the common case is handled with
+        str.find — a memchr-speed scan — producing the same alternating
+        [preamble, number, body, ...] list as the regex split. Any
+        header that deviates from the literal form (or a reply with no
+        headers at all) drops the whole parse to the tolerant regex.
+        """
+        upper = raw.upper()
+        parts: List[str] = []
+        prev = 0
+        pos = upper.find("SCENE NUMBER")
+        while pos >= 0:
+            m = pos + 12  # len("SCENE NUMBER")
+            if m < len(raw) and raw[m] == " ":
+                m += 1
+            if m >= len(raw) or raw[m] != "(":
+                return _SCENE_SPLIT_RE.split(raw)
+            m += 1
+            digits_start = m
+            while m < len(raw) and raw[m].isdigit():
+                m += 1
+            if m == digits_start or raw[m : m + 2] != "):":
+                return _SCENE_SPLIT_RE.split(raw)
+            parts.append(raw[prev:pos])
+            parts.append(raw[digits_start:m])
+            prev = m + 2
+            pos = upper.find("SCENE NUMBER", prev)
+        if not parts:
+            return _SCENE_SPLIT_RE.split(raw)
+        parts.append(raw[prev:])
+        return parts
+
+    @staticmethod
+    def _parse_scene_block(content: str) -> dict[str, List[str]]:
+        """Bucket a scene block's lines by section in one linear pass.
+
+        Per-field regex extraction re-scanned the whole block once per
+        field; this walks it once, switching buckets on header prefixes.
+        """
+        sections: dict[str, List[str]] = {
+            "setting": [],
+            "actors": [],
+            "threads": [],
+            "actions": [],
+        }
+        current: Optional[str] = None
+        for line in content.splitlines():
+            stripped = line.strip()
+            if not stripped:
+                continue
+            upper = stripped.upper()
+            for prefix, key in _SECTION_PREFIXES:
+                if upper.startswith(prefix):
+                    current = key
+                    rest = stripped[len(prefix) :].strip(" :")
+                    if rest:
+                        sections[key].append(rest)
+                    break
+            else:
+                if current is None:
+                    continue
+                head, sep, _ = stripped.partition(":")
+                if sep and head.isupper() and head.replace(" ", "").isalpha():
+                    # Some other ALL-CAPS header: ends the open section.
+                    current = None
+                    continue
+                sections[current].append(stripped)
+        return sections
+
+    @staticmethod
+    def _extract_actions(lines: List[str]) -> List[SceneAction]:
+        """Parse LIST OF ACTIONS lines into attributed actions."""
+        actions: List[SceneAction] = []
+        for line in lines:
+            line = line.strip().lstrip("-*").strip()
+            if not line:
+                continue
+            # Most lines carry none of the attribution verbs; a set
+            # check on the split tokens is far cheaper than entering
+            # the regex engine just to fail.
+            if _ACTION_VERBS.isdisjoint(line.lower().split()):
+                actions.append(SceneAction(actor="", action=line))
+                continue
+            match = _ACTOR_VERB_RE.match(line)
+            if match:
+                actor = match.group(1).strip()
+                actions.append(SceneAction(actor=actor, action=line[len(actor) :].strip()))
+            else:
+                actions.append(SceneAction(actor="", action=line))
+        return actions
+
+    # ------------------------------------------------------------------
+    # Prompt text rendering
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _characters_text(characters: List[Character]) -> str:
+        return "\n\n".join(c.to_prompt_text() for c in characters)
+
+    @staticmethod
+    def _tcc_prefix(tccn: TCCN) -> str:
+        """The byte-stable seed block shared by every call for one play.
+
+        Passed as ``cacheable_prefix`` so compose -> evaluate -> write ->
+        design all present the same prompt head and the provider bills
+        the TCCN once per play, not once per call.
+        """
+        return f"STORY SEED:\n{tccn.to_prompt_text()}\n\n"
+
+    @staticmethod
+    def _scene_to_text(scene: Scene) -> str:
+        actions_text = "\n".join(
+            f"- {a.actor}: {a.action}" if a.actor else f"- {a.action}"
+            for a in scene.actions
+        )
+        return (
+            f"Scene {scene.number}\n"
+            f"Setting: {scene.setting}\n"
+            f"Actors: {', '.join(scene.actors)}\n"
+            f"Actions:\n{actions_text}"
+        )
+
+    @staticmethod
+    def _scenes_to_text(tccn: TCCN, scenes: List[Scene]) -> str:
+        # Evaluate and write typically render the same outline; flatten
+        # it to a hashable key so repeat renders hit the lru cache below
+        # instead of re-running the f-string loop per scene and action.
+        key = tuple(
+            (
+                s.number,
+                s.setting,
+                tuple(s.actors),
+                tuple(s.narrative_threads),
+                tuple((a.actor, a.action) for a in s.actions),
+            )
+            for s in scenes
+        )
+        return _render_scenes_text(tccn.teleology, key)
+
+
+@lru_cache(maxsize=64)
+def _render_scenes_text(teleology: str, scenes_key: tuple) -> str:
+    """Render a flattened outline key back into the sectioned format."""
+    blocks = []
+    for number, setting, actors, threads, actions in scenes_key:
+        actions_text = "\n".join(
+            f"  - {actor + ': ' if actor else ''}{action}" for actor, action in actions
+        )
+        blocks.append(
+            f"SCENE NUMBER ({number}):\n"
+            f"SETTING: {setting}\n"
+            f"ACTORS: {', '.join(actors)}\n"
+            f"NARRATIVE THREADS: {', '.join(threads)}\n"
+            f"LIST OF ACTIONS:\n{actions_text}"
+        )
+    return f"TELEOLOGY: {teleology}\n\n" + "\n\n".join(blocks)
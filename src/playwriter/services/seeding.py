@@ -0,0 +1,106 @@
+"""Seeding: turning a bare premise into a TCCN seed document.
+
+``SeedingService`` asks the LLM for a sectioned TCCN draft (TITLE /
+TELEOLOGY / CONTEXT / CHARACTERS / NARRATIVE THREADS) and parses it back
+into the ``TCCN`` model. It also parses standalone character lists the
+LLM returns as (possibly fenced) JSON.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import List, Optional
+
+import orjson
+
+from ..llm import LLMProvider
+from ..models import TCCN, CharacterSummary, NarrativeThread
+from ..prompts import PromptLoader
+
+_SECTIONS = ("TITLE", "TELEOLOGY", "CONTEXT", "CHARACTERS", "NARRATIVE THREADS")
+
+_BULLET_RE = re.compile(r"^\d+[\.\)]\s*")
+_FENCED_JSON_RE = re.compile(r"```(?:json)?\s*\n?(.*?)```", re.DOTALL)
+
+
+class SeedingService:
+    """Generates and parses TCCN seed documents."""
+
+    def __init__(self, llm: LLMProvider, prompts: PromptLoader | None = None) -> None:
+        self._llm = llm
+        self._prompts = prompts or PromptLoader()
+
+    async def generate_tccn(self, premise: str) -> TCCN:
+        """Distill a premise into a full TCCN seed."""
+        user_prompt = self._prompts.render("generators", "TCCN_SEEDER", premise=premise)
+        raw = await self._llm.complete(
+            system_prompt="You distill a premise into a TCCN seed document for a play.",
+            user_prompt=user_prompt,
+            max_tokens=2048,
+        )
+        return self._parse_tccn_from_text(raw, premise)
+
+    def _parse_tccn_from_text(self, raw: str, premise: str) -> TCCN:
+        """Parse the seeder's sectioned text reply into a ``TCCN``."""
+        sections: dict[str, List[str]] = {name: [] for name in _SECTIONS}
+        current: Optional[str] = None
+        for line in raw.splitlines():
+            stripped = line.strip()
+            head, _, rest = stripped.partition(":")
+            header = head.strip().upper()
+            if header in sections:
+                current = header
+                if rest.strip():
+                    sections[current].append(rest.strip())
+                continue
+            if current is not None and stripped:
+                sections[current].append(stripped)
+
+        characters: List[CharacterSummary] = []
+        for line in sections["CHARACTERS"]:
+            line = _BULLET_RE.sub("", line).lstrip("-* ").strip()
+            if not line:
+                continue
+            name, _, summary = line.partition(":")
+            if name.strip():
+                characters.append(
+                    CharacterSummary(name=name.strip(), summary=summary.strip())
+                )
+
+        threads: List[NarrativeThread] = []
+        for line in sections["NARRATIVE THREADS"]:
+            line = line.lstrip("-* ").strip()
+            if not line:
+                continue
+            name, _, description = line.partition(":")
+            if name.strip():
+                threads.append(
+                    NarrativeThread(name=name.strip(), description=description.strip())
+                )
+
+        return TCCN(
+            title=" ".join(sections["TITLE"]).strip() or premise[:60],
+            teleology="\n".join(sections["TELEOLOGY"]).strip(),
+            context="\n".join(sections["CONTEXT"]).strip() or premise,
+            characters=characters,
+            narrative_threads=threads,
+        )
+
+    def parse_characters(self, text: str) -> List[CharacterSummary]:
+        """Parse a (possibly fenced) JSON character list from LLM output."""
+        match = _FENCED_JSON_RE.search(text)
+        if match:
+            text = match.group(1)
+        data = orjson.loads(text)
+        if isinstance(data, dict):
+            data = data.get("characters", [])
+        return [
+            CharacterSummary(
+                name=str(item.get("name", "")),
+                role=str(item.get("role", "")),
+                summary=str(item.get("summary", "")),
+                voice_style=str(item.get("voice_style", "")),
+            )
+            for item in data
+            if isinstance(item, dict) and item.get("name")
+        ]
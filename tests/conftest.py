@@ -0,0 +1,63 @@
+"""Shared test helpers: a scripted LLM provider, no network required."""
+
+from __future__ import annotations
+
+from typing import AsyncIterator, List, Optional
+
+from playwriter.llm import LLMProvider
+
+
+class ScriptedLLM(LLMProvider):
+    """Provider stub that replays canned replies and records its calls.
+
+    ``complete`` returns ``reply``; ``stream`` yields ``chunks`` when
+    given, otherwise degrades to one chunk holding ``reply`` — the same
+    contract real adapters without native streaming follow.
+    """
+
+    def __init__(self, reply: str = "", chunks: Optional[List[str]] = None) -> None:
+        self.reply = reply
+        self.chunks = chunks
+        self.calls: List[dict] = []
+
+    async def complete(
+        self,
+        *,
+        system_prompt: str,
+        user_prompt: str,
+        json_mode: bool = False,
+        max_tokens: int = 1024,
+        cacheable_prefix: str | None = None,
+    ) -> str:
+        self.calls.append(
+            {
+                "system_prompt": system_prompt,
+                "user_prompt": user_prompt,
+                "json_mode": json_mode,
+                "max_tokens": max_tokens,
+                "cacheable_prefix": cacheable_prefix,
+            }
+        )
+        return self.reply
+
+    async def stream(
+        self,
+        *,
+        system_prompt: str,
+        user_prompt: str,
+        json_mode: bool = False,
+        max_tokens: int = 1024,
+        cacheable_prefix: str | None = None,
+    ) -> AsyncIterator[str]:
+        if self.chunks is None:
+            yield await self.complete(
+                system_prompt=system_prompt,
+                user_prompt=user_prompt,
+                json_mode=json_mode,
+                max_tokens=max_tokens,
+                cacheable_prefix=cacheable_prefix,
+            )
+            return
+        self.calls.append({"json_mode": json_mode, "streamed": True})
+        for chunk in self.chunks:
+            yield chunk
@@ -0,0 +1,47 @@
+"""Behavior tests for the incremental ConversationMemory render cache."""
+
+from playwriter.services.character import ConversationMemory
+
+
+def _expected(memory: ConversationMemory) -> str:
+    return "\n".join(f"[{m.speaker}]: {m.content}" for m in memory.messages)
+
+
+def test_render_matches_messages():
+    memory = ConversationMemory()
+    memory.add_message("player", "Player", "hello")
+    memory.add_message("game_master", "GM", "a door creaks open")
+    assert memory.to_prompt_text() == "[Player]: hello\n[GM]: a door creaks open"
+
+
+def test_incremental_append_matches_full_join():
+    memory = ConversationMemory(window_size=10)
+    for i in range(3):
+        memory.add_message("player", "Player", f"line {i}")
+    # First render builds the cache; later adds must extend it in place.
+    assert memory.to_prompt_text() == _expected(memory)
+    memory.add_message("npc", "Iago", "as you wish")
+    assert memory.to_prompt_text() == _expected(memory)
+
+
+def test_eviction_trims_cached_head_exactly():
+    memory = ConversationMemory(window_size=3)
+    memory.add_message("player", "Player", "one")
+    memory.add_message("player", "Player", "two longer line")
+    memory.add_message("player", "Player", "three")
+    memory.to_prompt_text()  # warm the cache before the window overflows
+    memory.add_message("player", "Player", "four")
+    memory.add_message("player", "Player", "five")
+    assert memory.to_prompt_text() == _expected(memory)
+    assert "one" not in memory.to_prompt_text()
+
+
+def test_interleaved_renders_stay_consistent():
+    memory = ConversationMemory(window_size=4)
+    for i in range(12):
+        memory.add_message("player", f"Speaker{i % 3}", f"content {i}")
+        assert memory.to_prompt_text() == _expected(memory)
+
+
+def test_empty_memory_renders_empty():
+    assert ConversationMemory().to_prompt_text() == ""
@@ -0,0 +1,39 @@
+"""Behavior tests for dice outcome classification."""
+
+import numpy as np
+
+from playwriter.services.dice import DiceOutcome, DiceService
+
+from conftest import ScriptedLLM
+
+BANDS = [
+    (1, DiceOutcome.CATASTROPHIC_FAILURE),
+    (5, DiceOutcome.CATASTROPHIC_FAILURE),
+    (6, DiceOutcome.FAILURE),
+    (30, DiceOutcome.FAILURE),
+    (31, DiceOutcome.MIXED),
+    (60, DiceOutcome.MIXED),
+    (61, DiceOutcome.SUCCESS),
+    (90, DiceOutcome.SUCCESS),
+    (91, DiceOutcome.CRITICAL_SUCCESS),
+    (100, DiceOutcome.CRITICAL_SUCCESS),
+]
+
+
+def test_outcome_band_edges():
+    for value, outcome in BANDS:
+        assert DiceService.classify_outcome(value) is outcome
+
+
+def test_batch_classification_matches_scalar():
+    values = np.arange(1, 101, dtype=np.int16)
+    batch = DiceService.classify_outcome_batch(values)
+    assert batch == [DiceService.classify_outcome(int(v)) for v in values]
+
+
+def test_rolls_stay_in_range_and_seed_reproduces():
+    service = DiceService(ScriptedLLM(), seed=42)
+    rolls = service.roll_d100_batch(1000)
+    assert rolls.min() >= 1 and rolls.max() <= 100
+    again = DiceService(ScriptedLLM(), seed=42).roll_d100_batch(1000)
+    assert (rolls == again).all()
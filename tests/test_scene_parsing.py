@@ -0,0 +1,79 @@
+"""Behavior tests for SceneService outline parsing."""
+
+from playwriter.services.scene import _SCENE_SPLIT_RE, SceneService
+
+from conftest import ScriptedLLM
+
+
+def _service() -> SceneService:
+    return SceneService(ScriptedLLM())
+
+
+WELL_FORMED = (
+    "Here is the outline.\n\n"
+    "SCENE NUMBER (1):\n"
+    "SETTING: A rain-slick rooftop\n"
+    "ACTORS: Mara, Tobias\n"
+    "NARRATIVE THREADS: The debt, The storm\n"
+    "LIST OF ACTIONS:\n"
+    "- Mara says the debt is paid\n"
+    "- a thunderclap drowns the reply\n\n"
+    "SCENE NUMBER (2):\n"
+    "SETTING: The counting house\n"
+    "ACTORS: Tobias\n"
+    "NARRATIVE THREADS: The debt\n"
+    "LIST OF ACTIONS:\n"
+    "- Tobias enters the vault\n"
+)
+
+
+def test_split_fast_path_matches_regex():
+    for raw in (
+        WELL_FORMED,
+        "Scene Number (1):\nbody",  # lowercase header
+        "SCENE NUMBER 3:\nbody",  # paren-less header
+        "no scene headers at all",
+        "SCENE NUMBER (12):tail",
+    ):
+        assert SceneService._split_scene_blocks(raw) == _SCENE_SPLIT_RE.split(raw)
+
+
+def test_parse_scenes_well_formed():
+    scenes = _service()._parse_scenes(WELL_FORMED)
+    assert [s.number for s in scenes] == [1, 2]
+    first = scenes[0]
+    assert first.setting == "A rain-slick rooftop"
+    assert first.actors == ["Mara", "Tobias"]
+    assert first.narrative_threads == ["The debt", "The storm"]
+    assert len(first.actions) == 2
+    # Verb lines get attributed; verb-free lines stay unattributed.
+    assert first.actions[0].actor == "Mara"
+    assert first.actions[0].action == "says the debt is paid"
+    assert first.actions[1].actor == ""
+
+
+def test_parse_scenes_tolerates_loose_headers():
+    raw = "scene number (1):\nSETTING: A cellar\nACTORS: Rat\n"
+    scenes = _service()._parse_scenes(raw)
+    assert len(scenes) == 1
+    assert scenes[0].setting == "A cellar"
+
+
+def test_unknown_caps_header_closes_section():
+    sections = SceneService._parse_scene_block(
+        "SETTING: A garden\nDIRECTOR NOTES: keep it brief\nACTORS: Ophelia\n"
+    )
+    assert sections["setting"] == ["A garden"]
+    assert sections["actors"] == ["Ophelia"]
+    assert "keep it brief" not in sections["setting"]
+
+
+def test_extract_actions_verb_gate():
+    actions = SceneService._extract_actions(
+        ["- Mara walks to the ledge", "- silence", "- Tobias looks away"]
+    )
+    assert [(a.actor, a.action) for a in actions] == [
+        ("Mara", "walks to the ledge"),
+        ("", "silence"),
+        ("Tobias", "looks away"),
+    ]
@@ -0,0 +1,81 @@
+"""Behavior tests for the streaming world-event parser."""
+
+import asyncio
+import json
+
+from playwriter.engine.models import Act, NarrativeWorld
+from playwriter.engine.narrative import NarrativeEngine
+from playwriter.models import TCCN
+
+from conftest import ScriptedLLM
+
+
+def _engine_with_world(llm: ScriptedLLM) -> tuple[NarrativeEngine, str]:
+    engine = NarrativeEngine(llm)
+    world = NarrativeWorld(
+        id="w-test",
+        tccn=TCCN(title="t", teleology="end well", context="a stage"),
+    )
+    act = Act(id="a-test", number=1, status="running")
+    act.pin_trope_text("- Chekhov's Gun: it will fire")
+    world.acts.append(act)
+    engine._worlds[world.id] = world
+    return engine, world.id
+
+
+def _chunked(text: str, size: int = 7) -> list[str]:
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+EVENTS_REPLY = json.dumps(
+    {
+        "events": [
+            {"description": "A comet splits the sky", "scope": "global"},
+            {"description": "The harbor freezes", "scope": "local", "trope_name": "Omen"},
+        ]
+    }
+)
+
+
+def test_events_parsed_from_chunked_stream():
+    llm = ScriptedLLM(chunks=_chunked(EVENTS_REPLY))
+    engine, world_id = _engine_with_world(llm)
+    events = asyncio.run(engine.generate_world_events(world_id))
+    assert [e.description for e in events] == [
+        "A comet splits the sky",
+        "The harbor freezes",
+    ]
+    assert events[1].trope_name == "Omen"
+    assert engine.get_world(world_id).acts[-1].world_events == events
+
+
+def test_stream_requests_json_mode():
+    llm = ScriptedLLM(chunks=_chunked(EVENTS_REPLY))
+    engine, world_id = _engine_with_world(llm)
+    asyncio.run(engine.generate_world_events(world_id))
+    assert llm.calls and llm.calls[0]["json_mode"] is True
+
+
+def test_salvage_from_bare_array_reply():
+    # No "events" key at all: the stream scanner never engages and the
+    # salvage path must cope with a top-level JSON array.
+    reply = json.dumps([{"description": "Rain of frogs"}])
+    llm = ScriptedLLM(chunks=[reply])
+    engine, world_id = _engine_with_world(llm)
+    events = asyncio.run(engine.generate_world_events(world_id))
+    assert [e.description for e in events] == ["Rain of frogs"]
+
+
+def test_salvage_from_fenced_reply():
+    reply = f"Here you go:\n```json\n{EVENTS_REPLY}\n```"
+    llm = ScriptedLLM(chunks=[reply])
+    engine, world_id = _engine_with_world(llm)
+    events = asyncio.run(engine.generate_world_events(world_id))
+    assert len(events) == 2
+
+
+def test_non_streaming_provider_degrades_cleanly():
+    llm = ScriptedLLM(reply=EVENTS_REPLY)  # one full chunk via default stream
+    engine, world_id = _engine_with_world(llm)
+    events = asyncio.run(engine.generate_world_events(world_id))
+    assert len(events) == 2
@@ -0,0 +1,96 @@
+"""Character arena API.
+
+A small standalone Flask app for running side-by-side character
+experiments outside the main pipeline: characters are registered once,
+then embodied repeatedly as chat system prompts. It shares the shape of
+the core ``Character`` model but deliberately has no dependency on the
+package, so the arena can run against any provider setup.
+"""
+
+from __future__ import annotations
+
+from functools import cached_property
+from typing import Dict, List, Optional
+
+from flask import Flask, jsonify, request
+from pydantic import BaseModel, Field
+
+app = Flask(__name__)
+
+EMBODY_TEMPLATE = """You are the character described below. Stay in
+character at all times; speak with their voice, pursue their ambitions,
+and never mention that you are playing a role.
+
+{character_string}
+
+Respond to the user as this character would."""
+
+
+class Character(BaseModel):
+    """An arena character, registered once and embodied many times."""
+
+    name: str
+    archetype: str = ""
+    background: str = ""
+    ambitions: List[str] = Field(default_factory=list)
+    relationships: Dict[str, str] = Field(default_factory=dict)
+    voice_style: str = ""
+    internal_state: str = ""
+
+    @cached_property
+    def prompt_string(self) -> str:
+        """The dossier rendered as prompt text, computed once.
+
+        One join over the dumped fields rather than growing a string
+        with ``+=`` per field; characters are embodied on every chat
+        request, so the render is paid at first use and cached for the
+        model's lifetime.
+        """
+        return "\n".join(f"{k}: {v}" for k, v in self.model_dump().items())
+
+
+class CharacterGeneration:
+    """In-memory registry of arena characters."""
+
+    def __init__(self) -> None:
+        self._characters: Dict[str, Character] = {}
+
+    def add(self, character: Character) -> None:
+        self._characters[character.name] = character
+
+    def get(self, name: str) -> Optional[Character]:
+        return self._characters.get(name)
+
+    def names(self) -> List[str]:
+        return sorted(self._characters)
+
+    def get_embody_prompt(self, name: str) -> str:
+        """Build the embody system prompt for a registered character."""
+        character = self._characters[name]
+        return EMBODY_TEMPLATE.format(character_string=character.prompt_string)
+
+
+_generation = CharacterGeneration()
+
+
+@app.route("/characters", methods=["POST"])
+def create_character():
+    character = Character.model_validate(request.get_json(force=True))
+    _generation.add(character)
+    return jsonify({"name": character.name}), 201
+
+
+@app.route("/characters", methods=["GET"])
+def list_characters():
+    return jsonify({"characters": _generation.names()})
+
+
+@app.route("/characters/<name>/embody", methods=["GET"])
+def embody_character(name: str):
+    if _generation.get(name) is None:
+        return jsonify({"error": f"Unknown character: {name}"}), 404
+    return jsonify({"prompt": _generation.get_embody_prompt(name)})
+
+
+if __name__ == "__main__":
+    app.run(port=5017)
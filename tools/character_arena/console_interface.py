@@ -0,0 +1,88 @@
+"""Console front-end for the character arena.
+
+Runs a terminal chat loop against a registered character and logs every
+turn to a local sqlite database, so sessions can be replayed or scored
+later. The log uses one long-lived connection in WAL mode: opening a
+connection per turn pays connect + fsync every time, which is
+irrelevant for typing speed but serializes hard when a recorded session
+is replayed back in.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from typing import Iterable, Sequence
+
+from api import CharacterGeneration
+
+DB_NAME = "character_arena.db"
+
+# One connection for the process. WAL lets the replay writer coexist
+# with readers, and synchronous=NORMAL drops the per-commit fsync to a
+# WAL append — the durability trade (an OS crash can lose the last
+# commits, the database itself stays consistent) is right for a chat
+# log.
+_CONN = sqlite3.connect(DB_NAME, check_same_thread=False)
+_CONN.execute("PRAGMA journal_mode=WAL")
+_CONN.execute("PRAGMA synchronous=NORMAL")
+_CONN.execute(
+    "CREATE TABLE IF NOT EXISTS turns ("
+    "  session TEXT NOT NULL,"
+    "  character TEXT NOT NULL,"
+    "  role TEXT NOT NULL,"
+    "  content TEXT NOT NULL,"
+    "  created_at TEXT DEFAULT CURRENT_TIMESTAMP"
+    ")"
+)
+_CONN.commit()
+
+
+def insert_into_table(rows: Sequence[tuple[str, str, str, str]]) -> None:
+    """Insert (session, character, role, content) rows in one commit.
+
+    Batched with executemany so a replayed session costs one
+    transaction, not one fsync per turn.
+    """
+    _CONN.executemany(
+        "INSERT INTO turns (session, character, role, content) VALUES (?, ?, ?, ?)",
+        rows,
+    )
+    _CONN.commit()
+
+
+def replay_rows(session: str) -> Iterable[tuple[str, str]]:
+    """Yield (role, content) pairs of a recorded session, in order."""
+    return _CONN.execute(
+        "SELECT role, content FROM turns WHERE session = ? ORDER BY rowid",
+        (session,),
+    )
+
+
+def chat_loop(generation: CharacterGeneration, name: str, session: str) -> None:
+    """Interactive loop: reads user lines, prints the embody prompt turn."""
+    prompt = generation.get_embody_prompt(name)
+    print(f"[arena] embodying {name}; blank line to quit")
+    pending: list[tuple[str, str, str, str]] = []
+    while True:
+        try:
+            line = input("> ").strip()
+        except EOFError:
+            break
+        if not line:
+            break
+        pending.append((session, name, "user", line))
+        # The console front-end has no provider wired in; it records the
+        # user side and the prompt that a runner would answer with.
+        pending.append((session, name, "system", prompt))
+        if len(pending) >= 32:
+            insert_into_table(pending)
+            pending.clear()
+    if pending:
+        insert_into_table(pending)
+
+
+if __name__ == "__main__":
+    import sys
+
+    _generation = CharacterGeneration()
+    chat_loop(_generation, sys.argv[1] if len(sys.argv) > 1 else "arena", "default")